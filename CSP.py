@@ -3,72 +3,312 @@ This File demonstrates solving the crossword problem using constraints satisafic
 """
 
 import sys
+import json
+import random
 
 from crossword import *
 from crossword_creator import *
-import itertools
+from arc_consistency import ArcConsistency
+from domain import Trail
+from feasibility import FeasibilityAnalyzer
+from util import AnytimeResult, Budget, BudgetExceeded, SearchStats, Tracer
+from conflicts import ConflictSet, NogoodStore
+from matching import AllDifferent
+from ordering import DomWdeg, Mrv, Restart, luby, geometric
+from solution_cache import MISS, default_cache
 import timeit
 
 
 class CSP():
 
-    def __init__(self, crossword_creator):
+    FORWARD_CHECKING = "forward"
+    MAC = "mac"
+
+    MRV = "mrv"
+    DOM_WDEG = "domwdeg"
+
+    LUBY = "luby"
+    GEOMETRIC = "geometric"
+
+    def __init__(self, crossword_creator, inference=MAC, seed=None, backjumping=False, nogoods=10000,
+                 ordering=MRV, restarts=None, restart_base=32, all_different=True, cache=None):
         """
         Create new CSP crossword generate.
+        `inference` is what is done after each assignment during search:
+        None only checks the consistency of the assignment (no propagation),
+        CSP.FORWARD_CHECKING removes the values of the neighbours that conflict with the assignment and
+        CSP.MAC (Maintaining Arc Consistency) propagates the assignment until the domains are arc consistent.
+        When `seed` is given the ties of the variable and value orderings are broken randomly.
+        `backjumping` (with forward checking or MAC) turns on conflict-directed backjumping:
+        a dead end goes back to the deepest variable of its conflict set and the conflict sets
+        are learned as nogoods, at most `nogoods` of them are kept (least recently used are evicted).
+        `ordering` picks the next variable: CSP.MRV (fewest remaining values, then highest degree)
+        or CSP.DOM_WDEG (domain size / weighted degree, the constraints that empty domains gain weight).
+        `restarts` (CSP.LUBY or CSP.GEOMETRIC, with forward checking or MAC) restarts the search after
+        `restart_base` times the next term of the sequence failures, keeping the weights and nogoods
+        learned and drawing new random ties.
+        `all_different` (with MAC) also propagates the "no word used twice" constraint globally:
+        in each length class the words that no matching of the variables to distinct words can use
+        are removed, alternating with arc consistency until neither removes anything.
+        `cache` (a SolutionCache) answers `solve` for a structure, vocabulary and options solved before,
+        before the domains are built, and keeps the answers found (no solution too).
         """
         self.crossword_creator=crossword_creator
+        self.inference=inference
+        self.infeasibility=None
+        self.trail=Trail()
+        self.arc_consistency=ArcConsistency(crossword_creator, self.trail)
+        self.all_different=AllDifferent(crossword_creator, self.trail) if all_different and inference==CSP.MAC else None
+        self.neighbors={var: crossword_creator.crossword.neighbors(var) for var in crossword_creator.crossword.variables}
+        self.degree={var: len(neighbors) for var, neighbors in self.neighbors.items()}
+        # variables having the same length, a word assigned to one of them can't be used by the others
+        self.same_length=crossword_creator.crossword.same_length()
+        self.seed=seed
+        self.random=None if seed is None else random.Random(seed)
+        # rank used to break the ties of select_unassigned_variable, reading order without a seed
+        self.tiebreak={var: var.id if self.random is None else self.random.random()
+                       for var in crossword_creator.crossword.variables}
+        self.conflicts=None
+        self.nogoods=None
+        self.failure=0      # conflict set (bitmask of variable ids) of the last assignment that failed
+        if backjumping:
+            if inference is None:
+                raise ValueError("backjumping needs forward checking or MAC")
+            # conflicts[id] are the assigned variables that caused the reductions of the variable's domain
+            self.conflicts=[ConflictSet() for _ in crossword_creator.crossword.variable_list]
+            self.nogoods=NogoodStore(nogoods)
+        # heap of the variable ordering kept up to date by the propagation, without propagation
+        # the domains don't change and MRV scans them at every node instead
+        self.order=None
+        self.ordering=ordering
+        if ordering==CSP.DOM_WDEG:
+            self.order=DomWdeg(crossword_creator, self.tiebreak)
+        elif ordering!=CSP.MRV:
+            raise ValueError(f"unknown variable ordering {ordering!r}")
+        elif inference is not None:
+            self.order=Mrv(crossword_creator, self.tiebreak)
+        if self.conflicts is not None or self.order is not None:
+            self.arc_consistency.on_prune=self.pruned
+        if restarts not in (None, CSP.LUBY, CSP.GEOMETRIC):
+            raise ValueError(f"unknown restart schedule {restarts!r}")
+        if restarts is not None and inference is None:
+            raise ValueError("restarts need forward checking or MAC")
+        self.restarts=restarts
+        self.restart_base=restart_base
+        self.cutoff=None    # failures allowed in the current run
+        self.failures=0
+        self.runs=0
+        self.budget=None    # set by solve_anytime, checked at every node
+        self.best=dict()    # largest partial assignment reached while a budget is set
+        self.stats=SearchStats()    # counters and phase timings of the last solve
+        self.tracer=None    # a util.Tracer sampling the nodes and backtracks of the search
+        self.hints=None     # variable -> word tried first by order_domain_values (e.g. the previous solution)
+        self.cache=cache
+        self.cached=False   # whether the last solve was answered by the cache
 
     def solve(self):
         """
-            Enforce node and arc consistency, and then solve the CSP.
+            Reject the puzzle early if it is infeasible (the analyzer enforces node and arc consistency
+            while checking), and then solve the CSP.
+            The reason of a rejection is kept in `self.infeasibility`.
+            The counters and the time of each phase are kept in `self.stats`.
+            With a cache the answer is looked up first and `self.cached` tells if it was found
+            (the reason of a rejection isn't cached), answers found by a search that completed are cached.
+        """
+        self.stats=SearchStats()
+        self.cached=False
+        crossword=self.crossword_creator.crossword
+        key=self.cache_key()
+        if key is not None:
+            with self.stats.phase("cache"):
+                assignment=self.cache.lookup(key, crossword)
+            if assignment is not MISS:
+                self.cached=True
+                return assignment
+        base=self.counters()
+        try:
+            self.infeasibility=FeasibilityAnalyzer(self.crossword_creator, self.arc_consistency, self.stats).analyze()
+            assignment=None
+            if self.infeasibility is None:
+                with self.stats.phase("search"):
+                    if self.restarts is not None:
+                        assignment=self.restart_search()
+                    else:
+                        assignment=self.backtrack(dict())
+        finally:
+            self.collect_stats(base)
+        if key is not None:
+            self.cache.store(key, crossword, assignment)
+        return assignment
+
+    def options(self):
+        """The options that decide the answer of `solve`, part of the key of the solution cache."""
+        return {
+            "inference": self.inference,
+            "seed": self.seed,
+            "backjumping": self.conflicts is not None,
+            "nogoods": self.nogoods.capacity if self.nogoods is not None else None,
+            "ordering": self.ordering,
+            "restarts": self.restarts,
+            "restart_base": self.restart_base,
+            "all_different": self.all_different is not None,
+        }
+
+    def cache_key(self):
         """
-        valid=self.words_variables_consistency()
-        if valid==None:
+        Return the key of this solve in the cache, None without a cache or when the answer depends
+        on more than the puzzle and the options: hints, or domains already built (and maybe reduced) by the caller.
+        """
+        if self.cache is None or self.hints or self.crossword_creator.has_domains():
             return None
-        self.enforce_node_consistency()
-        self.ac3()
-        return self.backtrack(dict())
-
-
-    def words_variables_consistency(self):
+        return self.cache.key(self.crossword_creator.crossword, "csp", self.options())
+
+    def counters(self):
+        """The counters kept by the engines the CSP uses, `collect_stats` adds what they counted since."""
+        learned, hits=(self.nogoods.learned, self.nogoods.hits) if self.nogoods is not None else (0, 0)
+        prunes=self.arc_consistency.prunes
+        if self.all_different is not None:
+            prunes+=self.all_different.prunes
+        return (self.arc_consistency.revisions, prunes, learned, hits, self.runs)
+
+    def collect_stats(self, base):
+        """Add to `self.stats` what the engines counted since `base` (returned by `counters`)."""
+        revisions, prunes, learned, hits, runs=[now-then for now, then in zip(self.counters(), base)]
+        self.stats.revisions+=revisions
+        self.stats.prunes+=prunes
+        self.stats.nogoods_learned+=learned
+        self.stats.nogood_hits+=hits
+        self.stats.restarts+=max(runs-1, 0)
+
+    def expanded(self, var, assignment):
+        """Count a node of the search (`var` is the variable it assigns), the tracer samples it."""
+        self.stats.nodes_expanded+=1
+        if self.tracer is not None:
+            self.tracer.sample("node", depth=len(assignment), var=var.id, domain=len(self.crossword_creator.domains[var]))
+
+    def restart_search(self):
         """
-            Check if there are m variables with length l then there should be m words or greater that have length l 
+        Run the search again and again, each run stops after `cutoff` failures which grows
+        with the restart schedule so that a run eventually completes.
         """
-        
-        max_len=0
-        for word in self.crossword_creator.crossword.words:
-            if max_len<len(word):
-                max_len=len(word)
-        
-        occ_word=[0 for i in range(max_len+1)]
-        occ_variables=[0 for i in range(max_len+1)]
-
-        for var in self.crossword_creator.crossword.variables:
-            occ_variables[var.length]+=1
-        
-        for word in self.crossword_creator.crossword.words:
-            occ_word[len(word)]+=1
-
-
-        for idx,word in enumerate(occ_word):
-            if occ_variables[idx]>occ_word[idx]:
-                return None
-        return True 
-
-    
-    def enforce_node_consistency(self):
+        schedule=luby if self.restarts==CSP.LUBY else geometric
+        try:
+            while True:
+                self.runs+=1
+                self.cutoff=self.restart_base*schedule(self.runs)
+                self.failures=0
+                try:
+                    return self.backtrack(dict())
+                except Restart:
+                    if self.random is not None:
+                        for var in self.tiebreak:
+                            self.tiebreak[var]=self.random.random()
+                        if self.order is not None:
+                            self.order.tiebreak=[self.tiebreak[var] for var in self.crossword_creator.crossword.variable_list]
+        finally:
+            self.cutoff=None
+
+    def failed(self):
+        """Count a failed assignment, restart when the run has used its failures."""
+        self.failures+=1
+        if self.cutoff is not None and self.failures>self.cutoff:
+            raise Restart()
+
+    def unassign(self, var, assignment, mark):
+        """Undo the assignment of `var` and everything its propagation did since `mark`."""
+        self.trail.undo(mark)
+        assignment.pop(var, None)
+        self.stats.backtracks+=1
+        if self.tracer is not None:
+            self.tracer.sample("backtrack", depth=len(assignment), var=var.id)
+        if self.order is not None:
+            self.order.push(var.id)
+
+    def solve_anytime(self, time_limit=None, node_limit=None, token=None):
         """
-             Apply node consistency on all variables
+        Solve within `time_limit` seconds and `node_limit` nodes, `token` (a CancellationToken)
+        stops the search when it is cancelled. Return an AnytimeResult holding the solution,
+        or the partial assignment filling the most slots if the budget ran out first.
         """
-        for var in self.crossword_creator.crossword.variables:
-            new_domain=[]
-            for word in self.crossword_creator.domains[var]:
-                if var.length == len(word):
-                    new_domain.append(word)
-            self.crossword_creator.domains[var]=new_domain
-   
-
+        self.budget=Budget(time_limit, node_limit, token)
+        self.best=dict()
+        try:
+            assignment=self.solve()
+            status=AnytimeResult.SOLVED if assignment is not None else AnytimeResult.NO_SOLUTION
+        except BudgetExceeded as exceeded:
+            assignment=self.best
+            status=exceeded.reason
+        stats=self.stats.as_dict()
+        stats["elapsed"]=self.budget.elapsed()
+        self.budget=None
+        return AnytimeResult(status, assignment, stats)
+
+    def spend(self, assignment):
+        """Count a node against the budget and remember `assignment` if it is the largest so far."""
+        self.budget.spend()
+        if len(assignment)>len(self.best):
+            self.best=dict(assignment)
+
+    def iter_solutions(self, limit=None, budget=None, distinct=True):
+        """
+        Yield the solutions one by one as the search finds them, at most `limit` of them and
+        stopping after `budget` seconds. With `distinct`, solutions filling the grid with the
+        same letters are yielded once.
+        `self.exhausted` tells, once the generator is over, if every solution was found.
+        The domains are restored when the generator is finished or closed.
+        """
+        self.exhausted=False
+        self.infeasibility=FeasibilityAnalyzer(self.crossword_creator, self.arc_consistency).analyze()
+        if self.infeasibility is not None:
+            self.exhausted=True
+            return
+        if limit is not None and limit <= 0:
+            return
+        deadline=None if budget is None else timeit.default_timer()+budget
+        self.start_ordering(dict())
+        seen=set()
+        count=0
+        mark=self.trail.mark()
+        try:
+            for solution in self.search_all(dict(), deadline):
+                if distinct:
+                    grid=tuple(map(tuple, self.crossword_creator.letter_grid(solution)))
+                    if grid in seen:
+                        continue
+                    seen.add(grid)
+                yield solution
+                count+=1
+                if limit is not None and count>=limit:
+                    return
+            self.exhausted=deadline is None or timeit.default_timer()<=deadline
+        finally:
+            self.trail.undo(mark)
+
+    def search_all(self, assignment, deadline=None):
+        """
+        Generator version of the search: yield a copy of every complete assignment below `assignment`,
+        the search stops (without going deeper) once `deadline` has passed.
+        """
+        if len(assignment)==len(self.crossword_creator.crossword.variables):
+            yield dict(assignment)
+            return
+        var=self.select_unassigned_variable(assignment)
+        self.expanded(var, assignment)
+        for value in self.order_domain_values(var,assignment):
+            if deadline is not None and timeit.default_timer()>deadline:
+                return
+            self.stats.nodes_generated+=1
+            mark=self.trail.mark()
+            if self.inference is None:
+                assignment[var]=value
+                consistent=self.consistent(assignment)
+            else:
+                consistent=self.assign(var, value, assignment)
+            if consistent:
+                yield from self.search_all(assignment, deadline)
+            self.unassign(var, assignment, mark)
 
+    
     def revise(self, x, y):
         """
              This function implements the Arc-consistency between two variables,
@@ -76,49 +316,16 @@ class CSP():
              we should ensure that every value in X's domain has at least one possible
              choice from Y's domain
         """
-        revised= False # revised indicates whether or not we made a change for x'domain
-        overlap_idx=self.crossword_creator.crossword.overlaps[(x,y)]
-        for x_word in self.crossword_creator.domains[x]:
-            # check if there is possible value in Y's domain that statisifies the binary constraint between X and Y.
-            y_words=self.crossword_creator.domains[y]
-            no_match_found=any([True  if y_word[overlap_idx[1]]==x_word[overlap_idx[0]] else False for y_word in y_words])
-            if no_match_found == False:
-                self.crossword_creator.domains[x].remove(x_word)    # delete x_word from the domain of X
-                revised=True                      # We made a change for x'domain
-        return revised
+        return self.arc_consistency.revise(x, y)
 
 
 
     def ac3(self, arcs=None):
         """
-            Enforce the arc consistency across the entire problem
+            Enforce the arc consistency across the entire problem (or starting from `arcs`),
+            return False if some variable is left without any possible value
         """
-        queue=None
-        if arcs==None:
-            queue = list(itertools.product(self.crossword_creator.crossword.variables, self.crossword_creator.crossword.variables))
-            queue = [arc for arc in queue if arc[0] != arc[1] and self.crossword_creator.crossword.overlaps[arc[0], arc[1]] is not None]
-        else:
-            queue=arcs
-        
-        while len(queue)!=0:
-            cur_element=queue.pop(0)
-            x=cur_element[0]
-            y=cur_element[1]
-            if self.revise(x,y)==True:
-                if len(self.crossword_creator.domains[x])==0:
-                    return False    # There is no way to solve the problem because we can't find a value 
-                                    # for the X that statisfies all the overlapping constraint
-                else:
-                    """
-                    after changing the x's domain, it might become not arc consistent with other variables
-                    so we will check the consistency again along with x and it's neighbours except for y
-                    because we have already checked it.
-                    """
-                    other_neighbours=self.crossword_creator.crossword.neighbors(x).remove(y)
-                    if other_neighbours!=None:
-                        for z in other_neighbours:
-                            queue.append(tuple([x,z]))
-        return True
+        return self.arc_consistency.propagate(arcs)
 
 
        
@@ -178,19 +385,31 @@ class CSP():
         The first value in the list, for example, should be the one
         that rules out the fewest values among the neighbors of `var`.
         """
+        index=self.crossword_creator.crossword.index
         num_choices_avaliable = {word: 0 for word in self.crossword_creator.domains[var]}
-        neighbors=self.crossword_creator.crossword.neighbors(var)
+        neighbors=self.neighbors[var]
         var_words=self.crossword_creator.domains[var]
-        for w in var_words:
-            for neighbor in (neighbors - assignment.keys()):
-                overlap = self.crossword_creator.crossword.overlaps[var, neighbor]
-                # Loop through each word in neighbor's domain
-                for word_n in self.crossword_creator.domains[neighbor]:
-                    if w[overlap[0]]==word_n[overlap[1]]:
-                        num_choices_avaliable[w]+=1
-
-        sorted_list = sorted(num_choices_avaliable.items(), key=lambda x:x[1])
-        return  reversed([x[0] for x in sorted_list])
+        for neighbor in (neighbors - assignment.keys()):
+            overlap = self.crossword_creator.crossword.overlaps[var, neighbor]
+            neighbor_domain=self.crossword_creator.domains[neighbor]
+            # number of words in neighbor's domain having each letter at the overlapping cell
+            letter_count=dict()
+            for w in var_words:
+                letter=w[overlap[0]]
+                if letter not in letter_count:
+                    letter_count[letter]=neighbor_domain.count(index.mask_with(neighbor.length, overlap[1], letter))
+                num_choices_avaliable[w]+=letter_count[letter]
+
+        items=list(num_choices_avaliable.items())
+        if self.random is not None:
+            # the sort is stable so shuffling first breaks the ties randomly
+            self.random.shuffle(items)
+        sorted_list = sorted(items, key=lambda x:x[1])
+        values=reversed([x[0] for x in sorted_list])
+        hint=None if self.hints is None else self.hints.get(var)
+        if hint is not None and hint in var_words:
+            return [hint]+[value for value in values if value!=hint]
+        return values
 
     def select_unassigned_variable(self, assignment):
         """
@@ -200,16 +419,15 @@ class CSP():
         degree. If there is a tie, any of the tied variables are acceptable
         return values.
         """
-        unassigned_variables = self.crossword_creator.crossword.variables - assignment.keys()
-        num_remaining_values = {variable: len(self.crossword_creator.domains[variable]) for variable in unassigned_variables}
-        sorted_num_remaining_values = sorted(num_remaining_values.items(), key=lambda x: x[1])
-        if len(sorted_num_remaining_values) == 1 or sorted_num_remaining_values[0][1] != sorted_num_remaining_values[1][1]:
-            return sorted_num_remaining_values[0][0]
-        
-        else:
-            num_degrees = {variable: len(self.crossword_creator.crossword.neighbors(variable)) for variable in unassigned_variables}
-            sorted_num_degrees = sorted(num_degrees.items(), key=lambda x: x[1], reverse=True)
-            return sorted_num_degrees[0][0]
+        if self.order is not None:
+            variables=self.crossword_creator.crossword.variable_list
+            return variables[self.order.select(lambda var_id: variables[var_id] in assignment)]
+        domains = self.crossword_creator.domains
+        # a single pass with the degrees computed once, instead of sorting every unassigned variable
+        return min(
+            (variable for variable in self.crossword_creator.crossword.variables if variable not in assignment),
+            key=lambda variable: (len(domains[variable]), -self.degree[variable], self.tiebreak[variable])
+        )
 
     def backtrack(self, assignment):
         """
@@ -220,10 +438,16 @@ class CSP():
 
         If no assignment is possible, return None.
         """
+        if self.inference is not None:
+            return self.maintain_backtrack(assignment)
+        if self.budget is not None:
+            self.spend(assignment)
         if self.assignment_complete(assignment)==True:
             return assignment
         var=self.select_unassigned_variable(assignment)
+        self.expanded(var, assignment)
         for value in self.order_domain_values(var,assignment):
+            self.stats.nodes_generated+=1
             new_assignment=assignment.copy()
             new_assignment[var]=value
             if self.consistent(new_assignment)==True:
@@ -232,29 +456,290 @@ class CSP():
                 if result !=None: # indicates failure we got stuck with this value and we have to try another one
                     return result
                 assignment.pop(var, None)
+                self.stats.backtracks+=1
         return None # indicates that There is no possible assignment for this variable 
                     # So,the problem has no solution
 
+    def maintain_backtrack(self, assignment):
+        """
+        Backtracking Search that propagates every assignment (forward checking or MAC)
+        and undoes the propagation from the trail when it backtracks,
+        the domains are left as they were before the search.
+        """
+        mark=self.trail.mark()
+        try:
+            current=dict()
+            if self.inference==CSP.MAC and self.conflicts is None:
+                if not self.assign_all(assignment, current):
+                    return None
+            else:
+                for var, value in assignment.items():
+                    if not self.assign(var, value, current):
+                        return None
+            if not self.propagate_all_different(current):
+                return None
+            self.start_ordering(current)
+            result=self.search(current)
+            return None if result is None else dict(result)
+        finally:
+            self.trail.undo(mark)
+
+    def start_ordering(self, assignment):
+        """Fill the heap of the variable ordering with the variables not in `assignment`."""
+        if self.order is not None:
+            self.order.reset(var.id for var in self.crossword_creator.crossword.variable_list if var not in assignment)
+
+    def search(self, assignment):
+        """
+        Recursive part of `maintain_backtrack`, every value left in a domain is consistent
+        with the assigned neighbours so there is no need to check the whole assignment again.
+        """
+        if self.conflicts is not None:
+            return self.backjump_search(assignment)[0]
+        if self.budget is not None:
+            self.spend(assignment)
+        if len(assignment)==len(self.crossword_creator.crossword.variables):
+            return assignment
+        var=self.select_unassigned_variable(assignment)
+        self.expanded(var, assignment)
+        for value in self.order_domain_values(var,assignment):
+            self.stats.nodes_generated+=1
+            mark=self.trail.mark()
+            if self.assign(var, value, assignment):
+                result=self.search(assignment)
+                if result is not None:
+                    return result
+            else:
+                self.failed()
+            # undo the assignment and everything its propagation removed
+            self.unassign(var, assignment, mark)
+        return None
+
+    def backjump_search(self, assignment):
+        """
+        Search with conflict-directed backjumping, return (solution, 0) or (None, conflict set)
+        where the conflict set (bitmask of variable ids) holds the assigned variables that
+        explain the failure: the search goes back to the deepest of them, the variables
+        assigned after it are skipped since changing them can't remove the conflict.
+        """
+        if self.budget is not None:
+            self.spend(assignment)
+        if len(assignment)==len(self.crossword_creator.crossword.variables):
+            return assignment, 0
+        var=self.select_unassigned_variable(assignment)
+        self.expanded(var, assignment)
+        bit=1 << var.id
+        # the values of var's domain were removed because of these variables
+        conflict=self.conflicts[var.id].bits
+        for value in self.order_domain_values(var,assignment):
+            self.stats.nodes_generated+=1
+            mark=self.trail.mark()
+            if self.assign(var, value, assignment):
+                result, jump=self.backjump_search(assignment)
+                if result is not None:
+                    return result, 0
+                if not jump & bit:
+                    # var is not part of the conflict found below, no value of var can fix it
+                    self.unassign(var, assignment, mark)
+                    return None, jump
+                conflict|=jump
+            else:
+                conflict|=self.failure
+                self.failed()
+            self.unassign(var, assignment, mark)
+        conflict&=~bit
+        variables=self.crossword_creator.crossword.variable_list
+        self.nogoods.learn(frozenset((var_id, assignment[variables[var_id]]) for var_id in iter_bits(conflict)))
+        return None, conflict
+
+    def pruned(self, x, y):
+        """X's domain was reduced because of Y's (called by the arc consistency engine)."""
+        if self.conflicts is not None:
+            self.explain(x, y)
+        if self.order is not None:
+            self.order.push(x.id)
+
+    def explain(self, x, y):
+        """X's domain was reduced because of Y's, so X's conflict set gets Y's."""
+        conflict=self.conflicts[x.id]
+        bits=conflict.bits | self.conflicts[y.id].bits
+        if bits!=conflict.bits:
+            self.trail.save(conflict)
+            conflict.bits=bits
+
+    def fail(self, var, cause=None):
+        """
+        Record the conflict set of `var` as the reason of the failure and return False,
+        `cause` is the variable whose constraint with `var` emptied its domain.
+        """
+        if self.conflicts is not None:
+            self.failure=self.conflicts[var.id].bits
+        if self.order is not None and cause is not None:
+            self.order.bump(var.id, cause.id)
+        return False
+
+    def assign(self, var, value, assignment):
+        """
+        Assign `value` to `var` and propagate it, the cost depends only on what changes:
+        1) the domain of `var` becomes `value`
+        2) `value` is removed from the domains of the unassigned variables having the same length
+        3) the neighbours are revised against `var` (forward checking) and, for MAC,
+           the removals are propagated until the domains are arc consistent again.
+        Return False if a domain becomes empty, the caller has to undo the trail.
+        """
+        domains=self.crossword_creator.domains
+        domain=domains[var]
+        if value not in domain:
+            return self.fail(var)
+        conflicts=self.conflicts
+        if conflicts is not None:
+            variables=self.crossword_creator.crossword.variable_list
+            nogood=self.nogoods.violated(var.id, value, lambda var_id: assignment.get(variables[var_id]))
+            if nogood is not None:
+                self.failure=sum(1 << var_id for var_id, _ in nogood)
+                return False
+        assignment[var]=value
+        self.trail.save(domain)
+        domain.bits=1 << self.crossword_creator.crossword.index.ids[var.length][value]
+        if conflicts is not None:
+            # the domain of var is reduced by its own assignment
+            self.trail.save(conflicts[var.id])
+            conflicts[var.id].bits|=1 << var.id
+
+        changed=[var]
+        for other in self.same_length[var]:
+            if other not in assignment and value in domains[other]:
+                self.trail.save(domains[other])
+                domains[other].remove(value)
+                if conflicts is not None:
+                    self.explain(other, var)
+                if self.order is not None:
+                    self.order.push(other.id)
+                if not domains[other]:
+                    return self.fail(other, var)
+                changed.append(other)
+
+        neighbors=self.neighbors.__getitem__
+        if self.inference==CSP.FORWARD_CHECKING:
+            for x in changed:
+                for z in neighbors(x):
+                    if z not in assignment and self.revise(z, x) and not domains[z]:
+                        return self.fail(z, x)
+            return True
+        if not self.ac3([(z, x) for x in changed for z in neighbors(x) if z not in assignment]):
+            return self.fail(self.arc_consistency.wiped, self.arc_consistency.wiped_by)
+        return self.propagate_all_different(assignment)
+
+    def assign_all(self, values, assignment):
+        """
+        Assign all the variables of `values` and propagate them together: the crossings between
+        the assigned variables are checked first, so with MAC a consistent `values` leaves the domains
+        the same as propagating after each assignment, for a fraction of the revisions.
+        Return False if the values conflict or a domain becomes empty, the caller has to undo the trail.
+        """
+        crossword=self.crossword_creator.crossword
+        for var, value in values.items():
+            for other_id, i, j in crossword.adjacency[var.id]:
+                other=crossword.variable_list[other_id]
+                if other in values and value[i]!=values[other][j]:
+                    return self.fail(var, other)
+        domains=self.crossword_creator.domains
+        ids=crossword.index.ids
+        used=dict()     # length -> bitmask of the words assigned
+        for var, value in values.items():
+            if value not in domains[var]:
+                return self.fail(var)
+            bit=1 << ids[var.length][value]
+            if used.get(var.length, 0) & bit:
+                return self.fail(var)
+            used[var.length]=used.get(var.length, 0) | bit
+            assignment[var]=value
+            self.trail.save(domains[var])
+            domains[var].bits=bit
+        changed=list(values)
+        for var in self.crossword_creator.crossword.variable_list:
+            domain=domains[var]
+            if var not in assignment and domain.bits & used.get(var.length, 0):
+                self.trail.save(domain)
+                domain.bits&=~used[var.length]
+                if not domain:
+                    return self.fail(var)
+                changed.append(var)
+        neighbors=self.neighbors
+        if not self.ac3([(z, x) for x in changed for z in neighbors[x] if z not in assignment]):
+            return self.fail(self.arc_consistency.wiped, self.arc_consistency.wiped_by)
+        return True
+
+    def propagate_all_different(self, assignment):
+        """
+        Filter the length classes with the all-different propagator and propagate what it removed
+        with arc consistency, until neither removes a word. Return False on a failure.
+        The filtering can't empty a domain by itself, it fails when a class has no matching.
+        """
+        if self.all_different is None:
+            return True
+        neighbors=self.neighbors
+        while True:
+            changed=self.all_different.propagate()
+            if changed is None:
+                if self.conflicts is not None:
+                    # the words of the violator are too few because of the reductions of their domains
+                    self.failure=0
+                    for var in self.all_different.violator:
+                        self.failure|=self.conflicts[var.id].bits
+                return False
+            if not changed:
+                return True
+            for x in changed:
+                if self.conflicts is not None:
+                    # the words left to X depend on the domains of its whole length class
+                    for y in self.all_different.classes[x.length]:
+                        if y!=x:
+                            self.explain(x, y)
+                if self.order is not None:
+                    self.order.push(x.id)
+            if not self.ac3([(z, x) for x in changed for z in neighbors[x] if z not in assignment]):
+                return self.fail(self.arc_consistency.wiped, self.arc_consistency.wiped_by)
+
 
 def main():
 
+    # --stats prints the search statistics, --trace=FILE writes a sampled trace of the search
+    # --no-cache solves without the solution cache, which is also skipped with --stats or --trace
+    # since an answer found in the cache has no statistics and no trace
+    show_stats = "--stats" in sys.argv
+    trace = next((arg.split("=", 1)[1] for arg in sys.argv if arg.startswith("--trace=")), None)
+    use_cache = "--no-cache" not in sys.argv and not show_stats and trace is None
+    args = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+
     # Check usage
-    if len(sys.argv) not in [3, 4]:
-        sys.exit("Usage: python generate.py structure words [output]")
+    if len(args) not in [2, 3]:
+        sys.exit("Usage: python generate.py structure words [output] [--stats] [--trace=FILE] [--no-cache]")
 
     # Parse command-line arguments
-    structure = sys.argv[1]
-    words = sys.argv[2]
-    output = sys.argv[3] if len(sys.argv) == 4 else None
+    structure = args[0]
+    words = args[1]
+    output = args[2] if len(args) == 3 else None
 
     # Generate crossword
     crossword = Crossword(structure, words)
     creator = CrosswordCreator(crossword)
-    CSP_Problem=CSP(creator)
+    CSP_Problem=CSP(creator, cache=default_cache() if use_cache else None)
+    trace_file = open(trace, "w") if trace else None
+    if trace_file is not None:
+        CSP_Problem.tracer = Tracer(trace_file)
     start = timeit.default_timer()
-    assignment = CSP_Problem.solve()
+    try:
+        assignment = CSP_Problem.solve()
+    finally:
+        if trace_file is not None:
+            trace_file.close()
     stop = timeit.default_timer()
     print('Time Taken to solve the problem: ', stop - start)
+    if CSP_Problem.cached:
+        print("Answer found in the solution cache.")
+    if show_stats:
+        print(json.dumps(CSP_Problem.stats.as_dict(), indent=1))
 
     # Print result
     if assignment is None:
@@ -0,0 +1,93 @@
+"""
+This File contains the `ArcConsistency` class which enforces arc consistency over the domains
+of a `CrosswordCreator` (AC-3 with a deque worklist and residual supports, AC-3rm style).
+"""
+
+from collections import deque
+
+
+class ArcConsistency():
+
+    def __init__(self, crossword_creator, trail=None):
+        self.crossword_creator = crossword_creator
+        """
+        residues maps (x, y, letter) to the index of a word in Y's domain that had `letter`
+        at the overlapping cell the last time we looked, if it is still in Y's domain
+        the letter is still supported and we don't need to search Y's domain again.
+        Residues stay valid whatever happens to the domains, they are only checked.
+        """
+        self.residues = dict()
+        self.trail = trail   # when set, every domain change is recorded in it so that search can undo it
+        self.on_prune = None  # when set, called with (x, y) after X's domain was reduced because of Y's
+        self.wiped = None     # variable whose domain became empty the last time propagate failed
+        self.wiped_by = None  # and the variable it was revised against
+        self.revisions = 0   # number of calls of revise
+        self.prunes = 0      # number of words removed from the domains
+
+    def revise(self, x, y):
+        """
+        Make X arc-consistent with Y: remove from X's domain every word whose letter in the
+        overlapping cell has no possible choice in Y's domain.
+        Return True if X's domain was changed.
+        """
+        self.revisions += 1
+        crossword = self.crossword_creator.crossword
+        index = crossword.index
+        i, j = crossword.overlaps[x, y]
+        x_domain = self.crossword_creator.domains[x]
+        x_bits = x_domain.bits
+        y_bits = self.crossword_creator.domains[y].bits
+        keep = 0
+        for letter in index.letters_at(x.length, i):
+            x_mask = index.mask_with(x.length, i, letter)
+            if not x_bits & x_mask:
+                continue
+            residue = self.residues.get((x, y, letter))
+            if residue is not None and (y_bits >> residue) & 1:
+                keep |= x_mask
+                continue
+            support = y_bits & index.mask_with(y.length, j, letter)
+            if support:
+                self.residues[x, y, letter] = (support & -support).bit_length() - 1
+                keep |= x_mask
+        new_bits = x_bits & keep
+        if new_bits == x_bits:
+            return False
+        self.prunes += x_bits.bit_count() - new_bits.bit_count()
+        if self.trail is not None:
+            self.trail.save(x_domain)
+        x_domain.bits = new_bits
+        if self.on_prune is not None:
+            self.on_prune(x, y)
+        return True
+
+    def all_arcs(self):
+        """Return all the arcs (x, y) of the problem, i.e. every pair of overlapping variables."""
+        crossword = self.crossword_creator.crossword
+        return [(x, y) for x in crossword.variables for y in crossword.neighbors(x)]
+
+    def propagate(self, arcs=None):
+        """
+        Enforce arc consistency starting from `arcs` (all the arcs of the problem by default).
+        Return False if a domain becomes empty, i.e. the problem has no solution from here.
+        """
+        crossword = self.crossword_creator.crossword
+        domains = self.crossword_creator.domains
+        queue = deque(self.all_arcs() if arcs is None else arcs)
+        queued = set(queue)
+        while queue:
+            arc = queue.popleft()
+            queued.discard(arc)
+            x, y = arc
+            if self.revise(x, y):
+                if not domains[x]:
+                    self.wiped = x
+                    self.wiped_by = y
+                    return False
+                # X lost words so every Z overlapping X must be checked again against X,
+                # except Y because X's words were removed for having no support in Y
+                for z in crossword.neighbors(x):
+                    if z != y and (z, x) not in queued:
+                        queued.add((z, x))
+                        queue.append((z, x))
+        return True
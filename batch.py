@@ -0,0 +1,174 @@
+"""
+This File demonstrates solving many crosswords in one run: the dictionary is loaded and indexed once,
+the puzzles (a directory of structure files or a stream of structures) are solved by a pool of
+processes sharing the dictionary and one JSON line is written for each puzzle.
+"""
+
+import argparse
+import fnmatch
+import gc
+import json
+import multiprocessing
+import os
+import sys
+import timeit
+
+from crossword import *
+from crossword_creator import *
+from CSP import CSP
+from general_search import general_search
+from solution_cache import default_cache
+
+
+SOLVED = "solved"
+NO_SOLUTION = "no_solution"
+ERROR = "error"
+
+# the dictionary of the batch, loaded by the parent before the pool is created so that forked workers
+# share it (copy-on-write), workers started with another method load it again in `load_dictionary`
+dictionary = None
+
+# the solution cache of the process (None without one), every worker has its own memory tier and shares the disk tier
+solution_cache = None
+
+
+def use_cache(enabled):
+    """Solve the puzzles of this process with the default solution cache, or without a cache."""
+    global solution_cache
+    solution_cache = default_cache() if enabled else None
+
+
+def load_dictionary(words_file, cache=True):
+    """Load and index `words_file` unless it is already loaded (inherited from the parent)."""
+    global dictionary
+    use_cache(cache)
+    if dictionary is None:
+        dictionary = load_index(words_file)
+        # keep the index out of the garbage collector so that it isn't written to (and copied) in workers
+        gc.freeze()
+    return dictionary
+
+
+def read_stream(lines, name):
+    """
+    Split a multi-puzzle stream into (name, structure lines) pairs: structures are separated by
+    blank lines and a line starting with ";" names the structure that follows it.
+    """
+    puzzles = []
+    title = None
+    structure = []
+    for line in list(lines) + [""]:
+        line = line.rstrip("\n")
+        if line.startswith(";"):
+            title = line[1:].strip()
+        elif line.strip():
+            structure.append(line)
+        elif structure:
+            puzzles.append((title or f"{name}:{len(puzzles)}", structure))
+            title = None
+            structure = []
+    return puzzles
+
+
+def read_puzzles(sources, pattern="*"):
+    """
+    Yield the (name, structure lines) of the puzzles of `sources`: every file of a directory
+    whose name matches `pattern` (in name order) is a structure, a file or "-" (stdin) is a multi-puzzle stream.
+    """
+    for source in sources:
+        if source == "-":
+            yield from read_stream(sys.stdin, "stdin")
+        elif os.path.isdir(source):
+            for filename in sorted(fnmatch.filter(os.listdir(source), pattern)):
+                path = os.path.join(source, filename)
+                if os.path.isfile(path):
+                    with open(path) as f:
+                        yield path, f.read().splitlines()
+        else:
+            with open(source) as f:
+                yield from read_stream(f, source)
+
+
+def solve_puzzle(job):
+    """
+    Worker: solve one puzzle with the shared dictionary and return its JSON result,
+    `job` is (name, structure lines, solver) and solver is "csp" or a `general_search` strategy.
+    A puzzle answered by the solution cache has "cached" set.
+    """
+    name, structure, solver = job
+    result = {"name": name}
+    start = timeit.default_timer()
+    try:
+        crossword = Crossword.from_lines(structure, dictionary)
+        creator = CrosswordCreator(crossword)
+        if solver == "csp":
+            problem = CSP(creator, cache=solution_cache)
+            assignment = problem.solve()
+        else:
+            problem = general_search(creator, cache=solution_cache)
+            assignment = problem.solve(problem.initial_state, solver)
+        if problem.cached:
+            result["cached"] = True
+        if assignment is None:
+            result["status"] = NO_SOLUTION
+            if problem.infeasibility is not None:
+                result["reason"] = problem.infeasibility.as_dict()
+        else:
+            result["status"] = SOLVED
+            result["words"] = [
+                {"i": var.i, "j": var.j, "direction": var.direction, "word": word}
+                for var, word in sorted(assignment.items(), key=lambda item: item[0].id)
+            ]
+            result["grid"] = ["".join(letter or "#" for letter in row) for row in creator.letter_grid(assignment)]
+    except Exception as error:
+        result["status"] = ERROR
+        result["error"] = repr(error)
+    result["time"] = timeit.default_timer() - start
+    return result
+
+
+def solve_batch(words_file, puzzles, solver="csp", workers=None, chunksize=1, cache=True):
+    """
+    Solve the (name, structure lines) `puzzles` with a pool of `workers` processes and
+    yield their results as they complete, the dictionary is loaded once before the pool starts.
+    With `cache` the puzzles solved before (by this batch or an earlier run) are answered by the solution cache.
+    """
+    load_dictionary(words_file, cache)
+    jobs = ((name, structure, solver) for name, structure in puzzles)
+    with multiprocessing.Pool(workers, initializer=load_dictionary, initargs=(words_file, cache)) as pool:
+        yield from pool.imap_unordered(solve_puzzle, jobs, chunksize)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Solve many crosswords sharing one dictionary, write JSON lines.")
+    parser.add_argument("words", help="words file")
+    parser.add_argument("structures", nargs="+", help="directories of structure files, multi-puzzle files or - for stdin")
+    parser.add_argument("--solver", default="csp",
+                        choices=["csp", general_search.ASTAR, general_search.WEIGHTED_ASTAR,
+                                 general_search.BEAM, general_search.DEPTH_FIRST])
+    parser.add_argument("--workers", type=int, default=None, help="number of processes (number of cpus by default)")
+    parser.add_argument("--output", default=None, help="JSONL file to write (stdout by default)")
+    parser.add_argument("--no-cache", action="store_true", help="solve every puzzle without the solution cache")
+    parser.add_argument("--pattern", default="*",
+                        help="only the files of the structure directories matching this pattern (e.g. 'structure*.txt')")
+    args = parser.parse_args()
+
+    output = open(args.output, "w") if args.output else sys.stdout
+    try:
+        start = timeit.default_timer()
+        counts = {SOLVED: 0, NO_SOLUTION: 0, ERROR: 0}
+        for result in solve_batch(args.words, read_puzzles(args.structures, args.pattern), args.solver, args.workers,
+                                  cache=not args.no_cache):
+            output.write(json.dumps(result) + "\n")
+            output.flush()
+            counts[result["status"]] += 1
+        stop = timeit.default_timer()
+        summary = ", ".join(f"{count} {status}" for status, count in counts.items())
+        print(f"Processed {sum(counts.values())} puzzles in {stop - start} seconds: {summary}", file=sys.stderr)
+    finally:
+        if output is not sys.stdout:
+            output.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,266 @@
+"""
+This File contains the benchmark suite: seeded random structures (optionally symmetric, American-style)
+and dictionaries of chosen sizes are generated, both solvers are timed phase by phase and the results
+are written as JSON, which can then be compared against a baseline to flag regressions.
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import sys
+import time
+
+from crossword import *
+from crossword_creator import *
+from CSP import CSP
+from general_search import general_search
+from util import PhaseTimer
+
+
+DEFAULT_SOURCE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "words2.txt")
+
+
+def generate_structure(height, width, density, seed, symmetric=False):
+    """
+    Return the lines of a random structure where each cell is blocked ("#") with probability `density`.
+    A `symmetric` structure is the same once rotated by 180 degrees, like American crosswords.
+    """
+    rng = random.Random(seed)
+    grid = [["_"] * width for _ in range(height)]
+    for i in range(height):
+        for j in range(width):
+            if symmetric and (i, j) > (height - 1 - i, width - 1 - j):
+                grid[i][j] = grid[height - 1 - i][width - 1 - j]
+            elif rng.random() < density:
+                grid[i][j] = "#"
+    return ["".join(row) for row in grid]
+
+
+def generate_dictionary(size, seed, max_length, source=DEFAULT_SOURCE):
+    """
+    Return `size` distinct upper-case words of at most `max_length` letters: the words of `source`
+    first (in a random order) and then words made up by a letter bigram model learned from them,
+    with lengths spread between 2 and `max_length` so that long slots have candidates too.
+    """
+    rng = random.Random(seed)
+    with open(source) as f:
+        base = sorted({word.strip().upper() for word in f if word.strip().isalpha()})
+    rng.shuffle(base)
+    words = [word for word in base if len(word) <= max_length][:size]
+    seen = set(words)
+
+    starts = dict()
+    transitions = dict()
+    for word in base:
+        starts[word[0]] = starts.get(word[0], 0) + 1
+        for a, b in zip(word, word[1:]):
+            transitions.setdefault(a, dict())
+            transitions[a][b] = transitions[a].get(b, 0) + 1
+    start_letters, start_weights = list(starts), list(starts.values())
+    choices = {a: (list(follow), list(follow.values())) for a, follow in transitions.items()}
+
+    attempts = 0
+    while len(words) < size and attempts < size * 20:
+        attempts += 1
+        length = rng.randint(2, max(2, max_length))
+        letter = rng.choices(start_letters, start_weights)[0]
+        word = [letter]
+        while len(word) < length:
+            follow = choices.get(word[-1])
+            letter = rng.choices(*follow)[0] if follow else rng.choice(start_letters)
+            word.append(letter)
+        word = "".join(word)
+        if word not in seen:
+            seen.add(word)
+            words.append(word)
+    return words
+
+
+def split_stats(result):
+    """Return (status, phases, statistics) of the AnytimeResult of a solver."""
+    stats = dict(result.stats)
+    stats.pop("elapsed", None)
+    phases = stats.pop("phases")
+    return result.status, phases, stats
+
+
+def run_csp(crossword, time_limit):
+    """Time the CSP solver, `solve` times its phases (each feasibility check and the search)."""
+    problem = CSP(CrosswordCreator(crossword))
+    return split_stats(problem.solve_anytime(time_limit))
+
+
+def run_search(crossword, time_limit, strategy):
+    """Time the general search solver, `solve` times its phases (each feasibility check, count_actions and the search)."""
+    problem = general_search(CrosswordCreator(crossword))
+    return split_stats(problem.solve_anytime(problem.initial_state, strategy, 100, 2.0, time_limit))
+
+
+def run_case(case, time_limit):
+    """Generate the structure and dictionary of `case` and time the solver on it, return the result."""
+    lines = generate_structure(case["height"], case["width"], case["density"], case["seed"], case["symmetric"])
+    words = generate_dictionary(case["dictionary"], case["seed"], max(case["height"], case["width"]))
+    phases = dict()
+    with PhaseTimer(phases, "index"):
+        index = WordIndex(words)
+    with PhaseTimer(phases, "grid"):
+        crossword = Crossword.from_lines(lines, index)
+    if case["solver"] == "csp":
+        status, solve_phases, stats = run_csp(crossword, time_limit)
+    else:
+        status, solve_phases, stats = run_search(crossword, time_limit, case["solver"])
+    phases.update(solve_phases)
+    result = dict(case)
+    result.update({
+        "variables": len(crossword.variable_list),
+        "status": status,
+        "phases": phases,
+        "total": sum(phases.values()),
+        "stats": stats,
+    })
+    return result
+
+
+def case_name(case):
+    kind = "sym" if case["symmetric"] else "rand"
+    return (f"{case['solver']}/{case['height']}x{case['width']}/{kind}/d{case['density']}"
+            f"/w{case['dictionary']}/s{case['seed']}")
+
+
+def suite(sizes, densities, dictionaries, seeds, solvers, symmetric):
+    """Return the cases of the benchmark, every combination of the parameters."""
+    cases = []
+    for size in sizes:
+        for density in densities:
+            for dictionary in dictionaries:
+                for seed in seeds:
+                    for solver in solvers:
+                        for sym in symmetric:
+                            case = {"height": size, "width": size, "density": density, "dictionary": dictionary,
+                                    "seed": seed, "solver": solver, "symmetric": sym}
+                            case["name"] = case_name(case)
+                            cases.append(case)
+    return cases
+
+
+def run(cases, time_limit, repeat=1, log=sys.stderr):
+    """Run every case `repeat` times (keeping the fastest run) and return the JSON report."""
+    results = []
+    for case in cases:
+        best = None
+        for _ in range(repeat):
+            result = run_case(case, time_limit)
+            if best is None or result["total"] < best["total"]:
+                best = result
+        results.append(best)
+        if log is not None:
+            print(f"{best['name']}: {best['status']} in {best['total']:.4f}s", file=log)
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "time_limit": time_limit,
+            "repeat": repeat,
+        },
+        "results": results,
+    }
+
+
+def compare(baseline, current, threshold=0.2, floor=0.001):
+    """
+    Compare two reports case by case and return the list of regressions: a phase (or the total)
+    slower than the baseline by more than `threshold` (relative) and `floor` seconds, or a status that
+    changed. Cases missing from one of the reports are ignored.
+    """
+    regressions = []
+    before = {result["name"]: result for result in baseline["results"]}
+    for result in current["results"]:
+        old = before.get(result["name"])
+        if old is None:
+            continue
+        if result["status"] != old["status"]:
+            regressions.append({"name": result["name"], "what": "status",
+                                "baseline": old["status"], "current": result["status"]})
+        timings = [("total", old["total"], result["total"])]
+        timings += [(phase, old["phases"][phase], seconds)
+                    for phase, seconds in result["phases"].items() if phase in old["phases"]]
+        for what, then, now in timings:
+            if now - then > floor and now > then * (1 + threshold):
+                regressions.append({"name": result["name"], "what": what, "baseline": then, "current": now,
+                                    "ratio": now / then if then else None})
+    return regressions
+
+
+def integers(text):
+    return [int(value) for value in text.split(",")]
+
+
+def floats(text):
+    return [float(value) for value in text.split(",")]
+
+
+def solvers(text):
+    names = text.split(",")
+    unknown = [name for name in names if name != "csp" and name not in general_search.STRATEGIES]
+    if unknown:
+        raise argparse.ArgumentTypeError(f"unknown solvers {', '.join(unknown)} "
+                                         f"(choose from csp, {', '.join(general_search.STRATEGIES)})")
+    return names
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the crossword solvers on generated puzzles.")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = commands.add_parser("run", help="run the benchmark and write a JSON report")
+    run_parser.add_argument("--sizes", type=integers, default=[5, 7, 9])
+    run_parser.add_argument("--densities", type=floats, default=[0.3])
+    run_parser.add_argument("--dictionaries", type=integers, default=[1000, 5000])
+    run_parser.add_argument("--seeds", type=integers, default=[0, 1, 2])
+    run_parser.add_argument("--solvers", type=solvers, default=["csp", general_search.ASTAR],
+                            help="comma separated: csp and/or general_search strategies")
+    run_parser.add_argument("--symmetric", choices=["yes", "no", "both"], default="both")
+    run_parser.add_argument("--time-limit", type=float, default=10.0)
+    run_parser.add_argument("--repeat", type=int, default=1)
+    run_parser.add_argument("--output", default=None, help="JSON file to write (stdout by default)")
+    run_parser.add_argument("--baseline", default=None, help="report to compare the results with")
+    run_parser.add_argument("--threshold", type=float, default=0.2)
+
+    compare_parser = commands.add_parser("compare", help="compare a report with a baseline report")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("--threshold", type=float, default=0.2)
+
+    args = parser.parse_args()
+    if args.command == "run":
+        symmetric = {"yes": [True], "no": [False], "both": [False, True]}[args.symmetric]
+        cases = suite(args.sizes, args.densities, args.dictionaries, args.seeds, args.solvers, symmetric)
+        report = run(cases, args.time_limit, args.repeat)
+        text = json.dumps(report, indent=1)
+        if args.output:
+            with open(args.output, "w") as f:
+                f.write(text)
+        else:
+            print(text)
+        if args.baseline is None:
+            return
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    else:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        with open(args.current) as f:
+            report = json.load(f)
+
+    regressions = compare(baseline, report, args.threshold)
+    for regression in regressions:
+        print(json.dumps(regression), file=sys.stderr)
+    print(f"{len(regressions)} regressions", file=sys.stderr)
+    sys.exit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,294 @@
+"""
+This File contains the compiled dictionary format: the words of a `WordIndex` grouped by length in
+fixed-width byte arrays followed by the (length, position, letter) bitmasks, written once to a cache
+file keyed by the content hash of the words file and read back with `mmap`.
+`CompiledIndex` answers the same queries as `WordIndex` and only decodes what is asked for, the file
+pages are shared by all the processes that map it.
+
+Layout (little endian): MAGIC, sha256 of the source, number of lengths, then for each length
+(length, count, width, words offset, number of masks) and its masks (position, letter, offset).
+Each word takes `width` bytes of UTF-8 padded with zeros, each mask (count + 7) // 8 bytes.
+"""
+
+import hashlib
+import json
+import mmap
+import os
+import struct
+import tempfile
+
+from crossword import WordIndex, vocabulary_fingerprint
+
+
+MAGIC = b"CWDICT\x00\x01"
+HEADER = struct.Struct("<8s32sI")
+BUCKET = struct.Struct("<IIIQI")
+MASK = struct.Struct("<IIQ")
+
+
+def file_digest(path, chunk_size=1 << 20):
+    """Return the sha256 of the content of `path`."""
+    with open(path, "rb") as f:
+        if hasattr(hashlib, "file_digest"):
+            return hashlib.file_digest(f, "sha256").digest()
+        # before Python 3.11
+        digest = hashlib.sha256()
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+        return digest.digest()
+
+
+def compile_dictionary(index, destination, digest=b"\x00" * 32):
+    """
+    Write `index` (a WordIndex) to `destination` in the compiled format, the file is written
+    next to it first and then renamed so that readers never see a partial file.
+    """
+    buckets = []
+    for length in sorted(index.by_length):
+        words = [word.encode() for word in index.by_length[length]]
+        width = max((len(word) for word in words), default=0)
+        masks = sorted(
+            (position, ord(letter), mask)
+            for (mask_length, position, letter), mask in index.masks.items()
+            if mask_length == length
+        )
+        buckets.append((length, words, width, masks))
+
+    # the tables come first, the offsets of the data are known once their size is
+    offset = HEADER.size + sum(BUCKET.size + MASK.size * len(masks) for _, _, _, masks in buckets)
+    tables = []
+    for length, words, width, masks in buckets:
+        offset = align(offset)
+        words_offset = offset
+        offset += width * len(words)
+        mask_size = (len(words) + 7) // 8
+        entries = []
+        for position, letter, _ in masks:
+            offset = align(offset)
+            entries.append((position, letter, offset))
+            offset += mask_size
+        tables.append((words_offset, entries))
+
+    directory = os.path.dirname(os.path.abspath(destination))
+    os.makedirs(directory, exist_ok=True)
+    handle, temporary = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(handle, "wb") as f:
+            f.write(HEADER.pack(MAGIC, digest, len(buckets)))
+            for (length, words, width, masks), (words_offset, entries) in zip(buckets, tables):
+                f.write(BUCKET.pack(length, len(words), width, words_offset, len(entries)))
+                for entry in entries:
+                    f.write(MASK.pack(*entry))
+            for (length, words, width, masks), (words_offset, entries) in zip(buckets, tables):
+                pad(f, words_offset)
+                f.write(b"".join(word.ljust(width, b"\x00") for word in words))
+                mask_size = (len(words) + 7) // 8
+                for (_, _, mask), (_, _, mask_offset) in zip(masks, entries):
+                    pad(f, mask_offset)
+                    f.write(mask.to_bytes(mask_size, "little"))
+        os.chmod(temporary, 0o644)
+        os.replace(temporary, destination)
+    except BaseException:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+        raise
+
+
+def align(offset):
+    return (offset + 7) & ~7
+
+
+def pad(f, offset):
+    """Write zeros up to `offset`."""
+    f.write(b"\x00" * (offset - f.tell()))
+
+
+class LazyBuckets():
+
+    def __init__(self, build):
+        """Mapping from a length to a value computed by `build(length)` the first time it is needed."""
+        self.build = build
+        self.values = dict()
+
+    def __getitem__(self, length):
+        value = self.values.get(length)
+        if value is None:
+            value = self.values[length] = self.build(length)
+        return value
+
+    def get(self, length, default=None):
+        try:
+            return self[length]
+        except KeyError:
+            return default
+
+
+class CompiledIndex(WordIndex):
+
+    def __init__(self, path):
+        """
+        Map the compiled dictionary `path`, only the tables are read,
+        words and masks are decoded from the mapped pages the first time they are used.
+        A file that isn't a compiled dictionary, or is truncated, raises ValueError or struct.error.
+        """
+        self.path = path
+        with open(path, "rb") as f:
+            self.buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.digest, count = HEADER.unpack_from(self.buffer, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a compiled dictionary")
+        offset = HEADER.size
+        self.buckets = dict()       # length -> (count, width, words offset)
+        self.offsets = dict()       # (length, position, letter) -> offset of the mask
+        self.letters = dict()
+        for _ in range(count):
+            length, size, width, words_offset, entries = BUCKET.unpack_from(self.buffer, offset)
+            offset += BUCKET.size
+            if words_offset + size * width > len(self.buffer):
+                raise ValueError(f"{path} is truncated")
+            self.buckets[length] = (size, width, words_offset)
+            for _ in range(entries):
+                position, letter, mask_offset = MASK.unpack_from(self.buffer, offset)
+                offset += MASK.size
+                if mask_offset + (size + 7) // 8 > len(self.buffer):
+                    raise ValueError(f"{path} is truncated")
+                self.offsets[length, position, chr(letter)] = mask_offset
+                self.letters.setdefault((length, position), []).append(chr(letter))
+        self.letters = {key: tuple(letters) for key, letters in self.letters.items()}
+        self.masks = dict()
+        self.by_length = LazyBuckets(self.decode_bucket)
+        self.ids = LazyBuckets(lambda length: {word: idx for idx, word in enumerate(self.by_length[length])})
+        self._words = None
+
+    def __getstate__(self):
+        # the mapping can't be pickled, other processes map the file again
+        return self.path
+
+    def __setstate__(self, path):
+        self.__init__(path)
+
+    @property
+    def words(self):
+        """The set of all the words, decoding every bucket (only needed when the whole vocabulary is wanted)."""
+        if self._words is None:
+            self._words = {word for length in self.buckets for word in self.by_length[length]}
+        return self._words
+
+    def fingerprint(self):
+        """
+        The content hash of the words file the dictionary was compiled from identifies the vocabulary
+        without decoding it, a dictionary compiled without one is hashed like a WordIndex.
+        """
+        if self.digest != bytes(32):
+            return "file:" + self.digest.hex()
+        return vocabulary_fingerprint((length, self.by_length[length]) for length in sorted(self.buckets))
+
+    def decode_bucket(self, length):
+        """Decode the words of length `length` from the mapped file."""
+        if length not in self.buckets:
+            raise KeyError(length)
+        size, width, offset = self.buckets[length]
+        if width == 0:
+            return ("",) * size
+        data = self.buffer[offset:offset + size * width]
+        return tuple(data[k:k + width].rstrip(b"\x00").decode() for k in range(0, size * width, width))
+
+    def words_of_length(self, length):
+        if length not in self.buckets:
+            return ()
+        return self.by_length[length]
+
+    def full_mask(self, length):
+        return (1 << self.buckets.get(length, (0,))[0]) - 1
+
+    def mask_with(self, length, position, letter):
+        key = (length, position, letter)
+        mask = self.masks.get(key)
+        if mask is None:
+            offset = self.offsets.get(key)
+            if offset is None:
+                return 0
+            size = (self.buckets[length][0] + 7) // 8
+            mask = self.masks[key] = int.from_bytes(self.buffer[offset:offset + size], "little")
+        return mask
+
+
+def default_cache_dir():
+    """Directory of the compiled dictionaries, $CROSSWORD_CACHE or ~/.cache/crossword."""
+    return os.environ.get("CROSSWORD_CACHE") or os.path.join(os.path.expanduser("~"), ".cache", "crossword")
+
+
+def source_digest(words_file, cache_dir):
+    """
+    Return the sha256 of `words_file`, remembered in the cache directory by (path, size, mtime)
+    so that an unchanged words file isn't read again to be hashed, the paths that no longer
+    exist are dropped from the memo when it is written.
+    """
+    stat = os.stat(words_file)
+    key = os.path.abspath(words_file)
+    signature = [stat.st_size, stat.st_mtime_ns]
+    memo_path = os.path.join(cache_dir, "digests.json")
+    try:
+        with open(memo_path) as f:
+            memo = json.load(f)
+    except (OSError, ValueError):
+        memo = dict()
+    entry = memo.get(key)
+    if entry is not None and entry[:2] == signature:
+        return bytes.fromhex(entry[2])
+    digest = file_digest(words_file)
+    # forget the words files that were deleted or renamed since
+    memo = {path: entry for path, entry in memo.items() if os.path.exists(path)}
+    memo[key] = signature + [digest.hex()]
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        handle, temporary = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+        with os.fdopen(handle, "w") as f:
+            json.dump(memo, f)
+        os.replace(temporary, memo_path)
+    except OSError:
+        pass    # the digest is only recomputed next time
+    return digest
+
+
+def load_compiled(words_file, cache_dir=None):
+    """
+    Return the CompiledIndex of `words_file`, compiling it into the cache first if the cache
+    has no file for the current content of `words_file`, or if its file is corrupt.
+    """
+    cache_dir = cache_dir or default_cache_dir()
+    digest = source_digest(words_file, cache_dir)
+    # the hash of the path keeps apart the words files having the same name in different directories
+    source = hashlib.sha256(os.path.abspath(words_file).encode()).hexdigest()[:8]
+    name = f"{os.path.basename(words_file)}.{source}"
+    path = os.path.join(cache_dir, f"{name}.{digest.hex()[:16]}.cwdict")
+    for attempt in range(2):
+        if not os.path.exists(path):
+            with open(words_file) as f:
+                index = WordIndex(f.read().upper().splitlines())
+            compile_dictionary(index, path, digest)
+            remove_stale(cache_dir, name, path)
+        try:
+            return CompiledIndex(path)
+        except (ValueError, struct.error):
+            if attempt:
+                raise
+            os.remove(path)     # corrupt (e.g. truncated by a full disk), compiled again
+
+
+def remove_stale(cache_dir, name, current):
+    """
+    Remove the files compiled from earlier contents of the words file `name` (its file name and
+    the hash of its path), only `current` is kept.
+    Processes still mapping a removed file keep reading it, a file that can't be removed is left.
+    """
+    prefix = name + "."
+    for entry in os.scandir(cache_dir):
+        if not (entry.name.startswith(prefix) and entry.name.endswith(".cwdict")) or entry.path == current:
+            continue
+        version = entry.name[len(prefix):-len(".cwdict")]
+        if len(version) == 16 and all(c in "0123456789abcdef" for c in version):
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
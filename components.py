@@ -0,0 +1,158 @@
+"""
+This File demonstrates solving the crossword problem region by region: the overlap graph is split into
+connected components (groups of slots sharing no cell with the others), each component is solved on its
+own, in parallel processes when there are several, and the solutions are combined. The components only
+interact through the "no word used twice" constraint, so a word used by two components is fixed by
+solving one of them again without the words of the others.
+"""
+
+import sys
+import multiprocessing
+import timeit
+
+from crossword import *
+from crossword_creator import *
+from portfolio import Configuration
+
+
+def components(crossword):
+    """Return the connected components of the overlap graph as sorted lists of variable ids, in reading order."""
+    component = [None] * len(crossword.variable_list)
+    result = []
+    for root in range(len(crossword.variable_list)):
+        if component[root] is not None:
+            continue
+        component[root] = len(result)
+        members = [root]
+        stack = [root]
+        while stack:
+            var_id = stack.pop()
+            for other_id, _, _ in crossword.adjacency[var_id]:
+                if component[other_id] is None:
+                    component[other_id] = len(result)
+                    members.append(other_id)
+                    stack.append(other_id)
+        result.append(sorted(members))
+    return result
+
+
+def component_crossword(crossword, var_ids):
+    """
+    Return the crossword having only the cells of the variables `var_ids` open.
+    Cells of different components are never next to each other in a row or a column
+    (they would be part of the same slot), so the component keeps exactly its slots,
+    at the same positions: its variables are equal to those of `crossword`.
+    """
+    open_cells = {cell for var_id in var_ids for cell in crossword.variable_list[var_id].cells}
+    lines = [
+        "".join("_" if (i, j) in open_cells else "#" for j in range(crossword.width))
+        for i in range(crossword.height)
+    ]
+    return Crossword.from_lines(lines, crossword.index)
+
+
+def solve_component(crossword, configuration, excluded=()):
+    """
+    Solve the component `crossword` with `configuration` without the words `excluded`,
+    return the assignment as a mapping from (component) variable ids to words, or None.
+    """
+    assignment = configuration.solve(crossword, excluded)
+    if assignment is None:
+        return None
+    return {var.id: word for var, word in assignment.items()}
+
+
+def shared_words(solutions):
+    """Return a mapping from each word used by more than one of the `solutions` to the positions of those solutions."""
+    users = dict()
+    for position, solution in enumerate(solutions):
+        for word in set(solution.values()):
+            users.setdefault(word, []).append(position)
+    return {word: positions for word, positions in users.items() if len(positions) > 1}
+
+
+def solve_components(crossword, configuration=None, workers=None, context=None):
+    """
+    Solve `crossword` component by component with `configuration` (the CSP with MAC by default),
+    the components are solved by `workers` processes (the number of cpus by default) when there are several.
+    Return the assignment of the whole crossword, or None if there is none.
+
+    When a word is used by several components, the component with the most shared words (the smallest
+    one on ties) is solved again without the words of the other components, it can't conflict again.
+    If it has no solution then the other components of the conflict are tried, and if none of them can
+    give up the word the whole crossword is solved at once, since the components have to be solved together.
+    """
+    configuration = configuration or Configuration(Configuration.CSP_SOLVER)
+    groups = components(crossword)
+    if len(groups) <= 1:
+        return configuration.solve(crossword)
+    parts = [component_crossword(crossword, var_ids) for var_ids in groups]
+
+    workers = min(workers or multiprocessing.cpu_count(), len(parts))
+    if workers > 1:
+        context = context or multiprocessing.get_context()
+        with context.Pool(workers) as pool:
+            solutions = pool.starmap(solve_component, [(part, configuration) for part in parts])
+    else:
+        solutions = [solve_component(part, configuration) for part in parts]
+    if any(solution is None for solution in solutions):
+        # a component without solution is a proof only if the configuration is complete
+        return None if configuration.complete else configuration.solve(crossword)
+
+    while True:
+        conflicts = shared_words(solutions)
+        if not conflicts:
+            break
+        involved = dict()   # position -> number of words it shares
+        for positions in conflicts.values():
+            for position in positions:
+                involved[position] = involved.get(position, 0) + 1
+        for position in sorted(involved, key=lambda position: (-involved[position], len(groups[position]))):
+            excluded = {word for other, solution in enumerate(solutions) if other != position
+                        for word in solution.values()}
+            solution = solve_component(parts[position], configuration, excluded)
+            if solution is not None:
+                solutions[position] = solution
+                break
+        else:
+            return configuration.solve(crossword)
+
+    variables = {var: var for var in crossword.variable_list}
+    assignment = dict()
+    for part, solution in zip(parts, solutions):
+        for var_id, word in solution.items():
+            assignment[variables[part.variable_list[var_id]]] = word
+    return assignment
+
+
+def main():
+
+    # Check usage
+    if len(sys.argv) not in [3, 4, 5]:
+        sys.exit("Usage: python components.py structure words [output] [workers]")
+
+    # Parse command-line arguments
+    structure = sys.argv[1]
+    words = sys.argv[2]
+    output = sys.argv[3] if len(sys.argv) >= 4 else None
+    workers = int(sys.argv[4]) if len(sys.argv) == 5 else None
+
+    # Generate crossword
+    crossword = Crossword(structure, words)
+    creator = CrosswordCreator(crossword)
+    start = timeit.default_timer()
+    assignment = solve_components(crossword, workers=workers)
+    stop = timeit.default_timer()
+    print('Time Taken to solve the problem: ', stop - start)
+
+    # Print result
+    if assignment is None:
+        print("No solution.")
+    else:
+        creator.print(assignment)
+        if output:
+            creator.save(assignment, output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,74 @@
+"""
+This File contains what conflict-directed backjumping needs: the `ConflictSet` of a variable
+(the assigned variables responsible for the reductions of its domain) and the `NogoodStore`
+which remembers the partial assignments proven to have no solution.
+"""
+
+from collections import OrderedDict
+
+
+class ConflictSet():
+
+    __slots__ = ("bits",)
+
+    def __init__(self, bits=0):
+        """
+        Set of variables as a bitmask over the variable ids, kept in `bits`
+        like a domain so that the search trail can save and restore it.
+        """
+        self.bits = bits
+
+    def __repr__(self):
+        return f"ConflictSet({bin(self.bits)})"
+
+
+class NogoodStore():
+
+    def __init__(self, capacity=10000):
+        """
+        Bounded set of nogoods, a nogood is a frozenset of (variable id, word) that can't be part
+        of a solution. Nogoods are indexed by each of their (variable id, word) pairs and the
+        least recently used one is evicted once there are more than `capacity`.
+        """
+        self.capacity = capacity
+        self.nogoods = OrderedDict()
+        self.watches = dict()   # (variable id, word) -> set of the nogoods containing it
+        self.learned = 0        # nogoods added
+        self.hits = 0           # assignments rejected by a nogood
+
+    def __len__(self):
+        return len(self.nogoods)
+
+    def learn(self, nogood):
+        """Remember the frozenset `nogood`, the empty nogood (no solution at all) isn't stored."""
+        if not nogood or self.capacity <= 0:
+            return
+        if nogood in self.nogoods:
+            self.nogoods.move_to_end(nogood)
+            return
+        self.learned += 1
+        self.nogoods[nogood] = None
+        for literal in nogood:
+            self.watches.setdefault(literal, set()).add(nogood)
+        if len(self.nogoods) > self.capacity:
+            evicted, _ = self.nogoods.popitem(last=False)
+            for literal in evicted:
+                watchers = self.watches[literal]
+                watchers.discard(evicted)
+                if not watchers:
+                    del self.watches[literal]
+
+    def violated(self, var_id, word, value_of):
+        """
+        Return a nogood that assigning `word` to variable `var_id` would complete, or None,
+        `value_of(var_id)` gives the word currently assigned to a variable (None if unassigned).
+        """
+        watchers = self.watches.get((var_id, word))
+        if not watchers:
+            return None
+        for nogood in watchers:
+            if all(other == var_id or value_of(other) == value for other, value in nogood):
+                self.hits += 1
+                self.nogoods.move_to_end(nogood)
+                return nogood
+        return None
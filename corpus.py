@@ -0,0 +1,91 @@
+"""
+This File contains the streaming loader of word corpora: the corpus (plain text or gzip, one entry
+per line) is read in chunks, entries are normalized (stripped and upper-cased), entries that aren't
+a single alphabetic word are dropped and only the words having a length used by the grid are kept,
+so memory is bounded by the words kept and not by the size of the corpus.
+"""
+
+import gzip
+
+from crossword import Crossword, WordIndex
+
+
+GZIP_MAGIC = b"\x1f\x8b"
+
+
+def open_corpus(path):
+    """Open `path` as text, decompressing it if it is gzip."""
+    with open(path, "rb") as f:
+        compressed = f.read(2) == GZIP_MAGIC
+    if compressed:
+        return gzip.open(path, "rt", encoding="utf-8", errors="replace")
+    return open(path, encoding="utf-8", errors="replace")
+
+
+def iter_entries(path, chunk_size=1 << 20):
+    """Yield the lines of the corpus `path`, reading about `chunk_size` bytes at a time."""
+    with open_corpus(path) as f:
+        while True:
+            lines = f.readlines(chunk_size)
+            if not lines:
+                return
+            yield from lines
+
+
+def normalize(entry):
+    """Return the upper-cased word of `entry`, or None if it isn't a single alphabetic word."""
+    word = entry.strip().upper()
+    if not word or not word.isalpha():
+        return None
+    return word
+
+
+def load_corpus(path, lengths=None, quota=None, chunk_size=1 << 20):
+    """
+    Stream the corpus `path` and return the list of its distinct normalized words.
+    `lengths` keeps only the words of these lengths and `quota` maps a length to the number
+    of words wanted for it: the words of a length having its quota are skipped and reading
+    stops as soon as every length has its quota (lengths missing from `quota` are unlimited).
+    """
+    if lengths is not None:
+        lengths = set(lengths)
+    quota = dict(quota or {})
+    kept = dict()   # length -> set of the words kept
+    missing = {length for length, count in quota.items() if count > 0}
+    for entry in iter_entries(path, chunk_size):
+        word = normalize(entry)
+        if word is None:
+            continue
+        length = len(word)
+        if lengths is not None and length not in lengths:
+            continue
+        words = kept.setdefault(length, set())
+        limit = quota.get(length)
+        if limit is not None and len(words) >= limit:
+            continue
+        words.add(word)
+        if limit is not None and len(words) == limit:
+            missing.discard(length)
+            if not missing and lengths is not None and lengths <= quota.keys():
+                break
+    return [word for length in sorted(kept) for word in sorted(kept[length])]
+
+
+def crossword_from_corpus(structure_file, corpus_file, words_per_slot=None, chunk_size=1 << 20):
+    """
+    Create the crossword of `structure_file` with the words of the corpus `corpus_file` whose length is
+    the length of some slot. With `words_per_slot`, reading stops once there are that many words per
+    slot of every length (e.g. 1000 words of length 5 for a grid having one slot of length 5).
+    """
+    with open(structure_file) as f:
+        contents = f.read().splitlines()
+    # the slots don't depend on the vocabulary, it is attached once they are known
+    crossword = Crossword.from_lines(contents, WordIndex(()))
+    slots = dict()
+    for var in crossword.variables:
+        slots[var.length] = slots.get(var.length, 0) + 1
+    quota = None
+    if words_per_slot is not None:
+        quota = {length: count * words_per_slot for length, count in slots.items()}
+    crossword.index = WordIndex(load_corpus(corpus_file, slots, quota, chunk_size))
+    return crossword
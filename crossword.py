@@ -1,21 +1,30 @@
 """
-This File contains the `Variable` class which holds data about the each variable in crossword board
+This File contains the `Variable` class which holds data about the each variable in crossword board,
+the `WordIndex` class which indexes the words list by (length, position, letter)
 and contains `Crossword` class which contains the words list, variables of the crossword and the overlap between variables.
 
 """
 
+import hashlib
+
 
 class Variable():
 
     ACROSS = "across"
     DOWN = "down"
 
+    __slots__ = ("i", "j", "direction", "length", "cells", "id")
+
     def __init__(self, i, j, direction, length):
-        """Create a new variable with starting point, direction, and length."""
+        """
+        Create a new variable with starting point, direction, and length.
+        `id` is the dense integer id given by the crossword (position in `Crossword.variable_list`).
+        """
         self.i = i
         self.j = j
         self.direction = direction
         self.length = length
+        self.id = None
         self.cells = []
         for k in range(self.length):
             self.cells.append(
@@ -42,31 +51,192 @@ class Variable():
         return f"Variable({self.i}, {self.j}, {direction}, {self.length})"
 
 
-class Crossword():
+class Overlaps():
 
-    def __init__(self, structure_file, words_file):
+    __slots__ = ("rows",)
 
-        # Determine structure of crossword
+    def __init__(self, rows):
+        """
+        Overlaps between variables stored as a sparse matrix: `rows[v1.id]` maps the id of every
+        variable overlapping v1 to (i, j), where v1's ith character overlaps v2's jth character.
+        Indexing with a pair of variables gives None when they do not overlap, like the dict it replaces.
+        """
+        self.rows = rows
+
+    def __getitem__(self, pair):
+        v1, v2 = pair
+        return self.rows[v1.id].get(v2.id)
+
+    def get(self, pair, default=None):
+        result = self[pair]
+        return default if result is None else result
+
+
+class WordIndex():
+
+    def __init__(self, words):
+        """
+        Index the vocabulary once so that pattern queries don't have to scan every word.
+        Words are bucketed by length in immutable sorted tuples (`by_length`), a word is
+        then identified inside its bucket by its position in the tuple and a set of words
+        of the same length is a bitmask (python int) over that tuple.
+        `masks` maps (length, position, letter) to the bitmask of the words of that
+        length having `letter` at `position`.
+        """
+        self.words = set(words)
+        self.by_length = dict()
+        self.ids = dict()
+        self.masks = dict()
+        self.letters = dict()
+        self._fingerprint = None
+        buckets = dict()
+        for word in self.words:
+            buckets.setdefault(len(word), []).append(word)
+        for length, bucket in buckets.items():
+            bucket.sort()
+            self.by_length[length] = tuple(bucket)
+            self.ids[length] = {word: idx for idx, word in enumerate(bucket)}
+            for position in range(length):
+                # collect the positions of the words for each letter and build the mask once
+                positions = dict()
+                for idx, word in enumerate(bucket):
+                    positions.setdefault(word[position], []).append(idx)
+                for letter, indices in positions.items():
+                    self.masks[length, position, letter] = indices_to_mask(indices)
+                self.letters[length, position] = tuple(sorted(positions))
+
+    def fingerprint(self):
+        """Return the sha256 (hex) of the vocabulary, the same words give the same fingerprint whatever their order."""
+        if self._fingerprint is None:
+            self._fingerprint = vocabulary_fingerprint((length, self.by_length[length]) for length in sorted(self.by_length))
+        return self._fingerprint
+
+    def words_of_length(self, length):
+        """Return the tuple of words that have length `length`."""
+        return self.by_length.get(length, ())
+
+    def full_mask(self, length):
+        """Return the bitmask of all the words that have length `length`."""
+        return (1 << len(self.words_of_length(length))) - 1
+
+    def mask_with(self, length, position, letter):
+        """Return the bitmask of the words of length `length` having `letter` at `position`."""
+        return self.masks.get((length, position, letter), 0)
+
+    def letters_at(self, length, position):
+        """Return the letters that appear at `position` in some word of length `length`."""
+        return self.letters.get((length, position), ())
+
+    def pattern_mask(self, length, conditions):
+        """
+        Answer a pattern query as a bitmask, `conditions` maps a position to the letter
+        required there (positions mapped to None are free), e.g. pattern_mask(5, {0: "A", 3: "E"}).
+        """
+        mask = self.full_mask(length)
+        for position, letter in conditions.items():
+            if letter is not None:
+                mask &= self.mask_with(length, position, letter)
+                if not mask:
+                    break
+        return mask
+
+    def matching(self, length, conditions):
+        """Return the list of words of length `length` satisfying the pattern `conditions`."""
+        return self.decode(length, self.pattern_mask(length, conditions))
+
+    def decode(self, length, mask):
+        """Return the list of words of length `length` whose bits are set in `mask`."""
+        words = self.words_of_length(length)
+        return [words[idx] for idx in iter_bits(mask)]
+
+
+def vocabulary_fingerprint(buckets):
+    """Return the sha256 (hex) of a vocabulary given as (length, sorted words) pairs by increasing length."""
+    digest = hashlib.sha256()
+    for length, words in buckets:
+        digest.update(f"{length}:{len(words)}\n".encode())
+        digest.update("\n".join(words).encode())
+    return digest.hexdigest()
+
+
+def indices_to_mask(indices):
+    """Build the bitmask having the bits of `indices` set."""
+    # setting bits in a byte buffer is linear, or-ing into a growing int is quadratic
+    indices = list(indices)
+    if not indices:
+        return 0
+    buffer = bytearray(max(indices) // 8 + 1)
+    for idx in indices:
+        buffer[idx >> 3] |= 1 << (idx & 7)
+    return int.from_bytes(buffer, "little")
+
+
+def iter_bits(mask):
+    """Yield the positions of the set bits of `mask` in increasing order."""
+    # scanning the binary string is done in C, shifting a big int bit by bit is not
+    digits = bin(mask)[:1:-1]
+    idx = digits.find("1")
+    while idx != -1:
+        yield idx
+        idx = digits.find("1", idx + 1)
+
+
+def load_index(words_file, compiled=True):
+    """
+    Read the words of `words_file` (one per line) and index them.
+    With `compiled` the index is mapped from the compiled dictionary cache (built the first time),
+    it is built in memory if the cache can't be used.
+    """
+    if compiled:
+        from compiled_dictionary import load_compiled
+        try:
+            return load_compiled(words_file)
+        except OSError:
+            pass
+    with open(words_file) as f:
+        return WordIndex(f.read().upper().splitlines())
+
+
+class Crossword():
+
+    def __init__(self, structure_file, words_file=None, index=None):
+        """
+        Read the crossword from `structure_file` and the vocabulary from `words_file`,
+        or use the already built WordIndex `index` so that puzzles can share one dictionary.
+        """
         with open(structure_file) as f:
             contents = f.read().splitlines()
-            self.height = len(contents)
-            self.width = max(len(line) for line in contents)
-
-            self.structure = []
-            for i in range(self.height):
-                row = []
-                for j in range(self.width):
-                    if j >= len(contents[i]):
-                        row.append(False)
-                    elif contents[i][j] == "_":
-                        row.append(True)
-                    else:
-                        row.append(False)
-                self.structure.append(row)
+        if index is None:
+            index = load_index(words_file)
+        self.build(contents, index)
+
+    @classmethod
+    def from_lines(cls, contents, index):
+        """Create the crossword whose structure is given by the lines `contents` with the vocabulary `index`."""
+        crossword = cls.__new__(cls)
+        crossword.build(contents, index)
+        return crossword
+
+    def build(self, contents, index):
+
+        # Determine structure of crossword
+        self.height = len(contents)
+        self.width = max(len(line) for line in contents)
+
+        self.structure = []
+        for i in range(self.height):
+            row = []
+            for j in range(self.width):
+                if j >= len(contents[i]):
+                    row.append(False)
+                elif contents[i][j] == "_":
+                    row.append(True)
+                else:
+                    row.append(False)
+            self.structure.append(row)
 
         # Save vocabulary list
-        with open(words_file) as f:
-            self.words = set(f.read().upper().splitlines())
+        self.index = index
 
         # Determine variable set
         self.variables = set()
@@ -137,34 +307,61 @@ class Crossword():
                         ))
 
         """
-         Compute overlaps between each 2 variables
+         Give the variables dense ids (in reading order) and compute the overlaps between them
+         from an index of the slots covering each cell, so only variables sharing a cell are compared.
          For any pair of variables v1, v2, their overlap is either:
          None, if the two variables do not overlap; or
          (i, j), where v1's ith character overlaps v2's jth character
         """
+        self.variable_list = sorted(self.variables, key=lambda v: (v.i, v.j, v.direction))
+        for idx, var in enumerate(self.variable_list):
+            var.id = idx
 
-        self.overlaps = dict()
-        for v1 in self.variables:
-            for v2 in self.variables:
-                if v1 == v2:
-                    continue
-                cells1 = v1.cells
-                cells2 = v2.cells
-                intersection = set(cells1).intersection(cells2)
-                if not intersection:
-                    self.overlaps[v1, v2] = None
-                else:
-                    intersection = intersection.pop()
-                    self.overlaps[v1, v2] = (
-                        cells1.index(intersection),
-                        cells2.index(intersection)
-                    )
+        # cell_slots[i * width + j] is the list of (variable id, position in the variable) covering cell (i, j)
+        self.cell_slots = [[] for _ in range(self.height * self.width)]
+        for var in self.variable_list:
+            for position, (i, j) in enumerate(var.cells):
+                self.cell_slots[i * self.width + j].append((var.id, position))
+
+        rows = [dict() for _ in self.variable_list]
+        for slots in self.cell_slots:
+            for id1, position1 in slots:
+                for id2, position2 in slots:
+                    if id1 != id2:
+                        rows[id1][id2] = (position1, position2)
+        self.overlaps = Overlaps(rows)
 
+        # adjacency[id] is the tuple of (neighbor id, i, j) and neighbor_sets[id] the set of overlapping variables
+        self.adjacency = [tuple((id2, i, j) for id2, (i, j) in row.items()) for row in rows]
+        self.neighbor_sets = [
+            frozenset(self.variable_list[id2] for id2 in row)
+            for row in rows
+        ]
 
+    @property
+    def words(self):
+        """The set of the words of the vocabulary."""
+        return self.index.words
+
+    def fingerprint(self):
+        """Return the sha256 (hex) of the parsed structure, the grid of open and blocked cells."""
+        rows = ["".join("_" if cell else "#" for cell in row) for row in self.structure]
+        return hashlib.sha256("\n".join(rows).encode()).hexdigest()
+
+    def same_length(self):
+        """
+        Return a mapping from each variable to the list of the other variables having its length,
+        the variables are grouped by length first so the cost is the total size of the lists.
+        """
+        groups = dict()
+        for var in self.variable_list:
+            groups.setdefault(var.length, []).append(var)
+        return {var: [other for other in groups[var.length] if other is not var] for var in self.variable_list}
+
+    def slots_at(self, i, j):
+        """Return the list of (variable, position) of the variables covering cell (i, j)."""
+        return [(self.variable_list[idx], position) for idx, position in self.cell_slots[i * self.width + j]]
 
     def neighbors(self, var):
         """Given a variable, return set of overlapping variables."""
-        return set(
-            v for v in self.variables
-            if v != var and self.overlaps[v, var]
-        )
+        return self.neighbor_sets[var.id]
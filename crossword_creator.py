@@ -4,8 +4,10 @@ This File contains `CrosswordCreator` class which has `crossword`(which contains
 and the domain of each variable also this class contains some utilities functions for printing and saving the output
 """
 
+from functools import cached_property
 
 from crossword import *
+from domain import Domain
 
 
 
@@ -14,13 +16,47 @@ class CrosswordCreator():
     def __init__(self, crossword):
         """
         Create new CSP crossword generate.
+        The domain of each variable is a bitmask over the words that have its length
+        so domains share the words of the index instead of copying the vocabulary.
+        The domains are only built when they are first used, a solver answering
+        from its solution cache never needs them.
         """
         self.crossword = crossword
-        self.domains = {
-            var: self.crossword.words.copy()
+
+    @cached_property
+    def domains(self):
+        return {
+            var: Domain(self.crossword.index, var.length)
             for var in self.crossword.variables
         }
 
+    def has_domains(self):
+        """Return True if the domains were built (and possibly reduced) already."""
+        return "domains" in vars(self)
+
+    def snapshot(self):
+        """
+        Return the current domains as a mapping from variables to bitmasks,
+        ints are immutable so this is cheap and can be given back to `restore`.
+        """
+        return {var: domain.bits for var, domain in self.domains.items()}
+
+    def restore(self, snapshot):
+        """Restore the domains saved by `snapshot`."""
+        for var, bits in snapshot.items():
+            self.domains[var].bits = bits
+
+    def exclude(self, words):
+        """Remove `words` from the domains of all the variables (words of the other lengths are ignored)."""
+        index = self.crossword.index
+        masks = dict()  # length -> bitmask of the excluded words of that length
+        for word in words:
+            idx = index.ids.get(len(word), {}).get(word)
+            if idx is not None:
+                masks[len(word)] = masks.get(len(word), 0) | 1 << idx
+        for var, domain in self.domains.items():
+            domain.bits &= ~masks.get(var.length, 0)
+
 
     def letter_grid(self, assignment):
         """
@@ -0,0 +1,91 @@
+"""
+This File contains the `Domain` class which holds the domain of a variable as a bitmask
+over the shared (immutable) tuple of the words that have the variable's length.
+"""
+
+from crossword import iter_bits
+
+
+class Domain():
+
+    __slots__ = ("index", "length", "bits")
+
+    def __init__(self, index, length, bits=None):
+        """
+        Create the domain of a variable of length `length`,
+        by default it contains all the words of that length in `index`.
+        """
+        self.index = index
+        self.length = length
+        self.bits = index.full_mask(length) if bits is None else bits
+
+    def __len__(self):
+        return self.bits.bit_count()
+
+    def __bool__(self):
+        return self.bits != 0
+
+    def __iter__(self):
+        words = self.index.words_of_length(self.length)
+        for idx in iter_bits(self.bits):
+            yield words[idx]
+
+    def __contains__(self, word):
+        idx = self.index.ids.get(self.length, {}).get(word)
+        return idx is not None and (self.bits >> idx) & 1 == 1
+
+    def __repr__(self):
+        return f"Domain(length={self.length}, size={len(self)})"
+
+    def copy(self):
+        return Domain(self.index, self.length, self.bits)
+
+    def remove(self, word):
+        """Remove `word` from the domain, raise KeyError if it isn't in it."""
+        if word not in self:
+            raise KeyError(word)
+        self.bits &= ~(1 << self.index.ids[self.length][word])
+
+    def discard(self, word):
+        """Remove `word` from the domain if it is in it."""
+        if word in self:
+            self.bits &= ~(1 << self.index.ids[self.length][word])
+
+    def intersect(self, mask):
+        """Keep only the words whose bits are set in `mask`, return True if the domain changed."""
+        bits = self.bits & mask
+        if bits == self.bits:
+            return False
+        self.bits = bits
+        return True
+
+    def count(self, mask):
+        """Return the number of words of the domain whose bits are set in `mask`."""
+        return (self.bits & mask).bit_count()
+
+
+class Trail():
+
+    __slots__ = ("entries",)
+
+    def __init__(self):
+        """
+        Undo log of the domains changed during search, every change is preceded by
+        saving the domain's previous bitmask so that going back to a mark restores them.
+        """
+        self.entries = []
+
+    def mark(self):
+        """Return a mark that `undo` can later go back to."""
+        return len(self.entries)
+
+    def save(self, domain):
+        """Remember the current bits of `domain` before changing it."""
+        self.entries.append((domain, domain.bits))
+
+    def undo(self, mark):
+        """Restore all the domains changed since `mark` was taken."""
+        entries = self.entries
+        while len(entries) > mark:
+            domain, bits = entries.pop()
+            domain.bits = bits
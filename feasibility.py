@@ -0,0 +1,160 @@
+"""
+This File contains the `FeasibilityAnalyzer` class which rejects impossible puzzles before search
+and the `Infeasibility` class which describes why a puzzle was rejected.
+"""
+
+from arc_consistency import ArcConsistency
+from matching import max_matching
+
+
+class Infeasibility():
+
+    LENGTH_COUNT = "length_count"        # more variables of some length than words of that length
+    EMPTY_DOMAIN = "empty_domain"        # a variable has no possible word after node/arc consistency
+    CROSSING = "crossing"                # no letter fits both directions of a crossing cell
+    ALL_DIFFERENT = "all_different"      # a set of variables of the same length has fewer words than variables
+
+    def __init__(self, kind, message, variables=(), cell=None):
+        self.kind = kind
+        self.message = message
+        self.variables = tuple(variables)
+        self.cell = cell
+
+    def __str__(self):
+        return self.message
+
+    def __repr__(self):
+        return f"Infeasibility({self.kind!r}, {self.message!r})"
+
+    def as_dict(self):
+        return {
+            "kind": self.kind,
+            "message": self.message,
+            "variables": [str(var) for var in self.variables],
+            "cell": self.cell,
+        }
+
+
+class FeasibilityAnalyzer():
+
+    def __init__(self, crossword_creator, arc_consistency=None, stats=None):
+        """
+        `arc_consistency` is the engine of the solver, so that the counters of the
+        pre-search arc consistency pass are reported with the solver's own.
+        When `stats` (a SearchStats) is given the time of each check is added to its phases.
+        """
+        self.crossword_creator = crossword_creator
+        self.arc_consistency = arc_consistency or ArcConsistency(crossword_creator)
+        self.stats = stats
+
+    def analyze(self, propagate=True):
+        """
+        Run the checks from the cheapest to the most expensive one and return the `Infeasibility`
+        found by the first that fails, or None if the puzzle may be solvable.
+        Node consistency (and arc consistency when `propagate` is True) is enforced
+        on the domains of the crossword creator while checking.
+        """
+        checks = [("length_count", self.check_length_count),
+                  ("node_consistency", self.check_node_consistency),
+                  ("crossings", self.check_crossings)]
+        if propagate:
+            checks.append(("ac3", self.check_arc_consistency))
+        checks.append(("all_different", self.check_all_different))
+        for name, check in checks:
+            if self.stats is None:
+                reason = check()
+            else:
+                with self.stats.phase(name):
+                    reason = check()
+            if reason is not None:
+                return reason
+        return None
+
+    def length_classes(self):
+        """Return a dict mapping each length to the list of variables having it, in a fixed order."""
+        classes = dict()
+        for var in self.crossword_creator.crossword.variable_list:
+            classes.setdefault(var.length, []).append(var)
+        return classes
+
+    def check_length_count(self):
+        """
+        Check if there are m variables with length l then there should be m words or more that have length l
+        """
+        index = self.crossword_creator.crossword.index
+        for length, variables in sorted(self.length_classes().items()):
+            available = index.full_mask(length).bit_count()
+            if len(variables) > available:
+                return Infeasibility(
+                    Infeasibility.LENGTH_COUNT,
+                    f"{len(variables)} variables of length {length} but only {available} words",
+                    variables
+                )
+        return None
+
+    def check_node_consistency(self):
+        """Remove the words of other lengths from the domains and check none is left empty."""
+        index = self.crossword_creator.crossword.index
+        for var in self.crossword_creator.crossword.variable_list:
+            domain = self.crossword_creator.domains[var]
+            domain.intersect(index.full_mask(var.length))
+            if not domain:
+                return Infeasibility(Infeasibility.EMPTY_DOMAIN, f"no possible word for {var}", [var])
+        return None
+
+    def check_crossings(self):
+        """Check that for every crossing cell some letter is possible in both directions."""
+        crossword = self.crossword_creator.crossword
+        index = crossword.index
+        domains = self.crossword_creator.domains
+        variables = crossword.variable_list
+        for x in variables:
+            # variables are in reading order, so the reasons given are the same from one run to another
+            for y_id, i, j in sorted(crossword.adjacency[x.id]):
+                y = variables[y_id]
+                x_bits = domains[x].bits
+                y_bits = domains[y].bits
+                if not any(
+                    x_bits & index.mask_with(x.length, i, letter) and y_bits & index.mask_with(y.length, j, letter)
+                    for letter in index.letters_at(x.length, i)
+                ):
+                    cell = x.cells[i]
+                    return Infeasibility(
+                        Infeasibility.CROSSING,
+                        f"no letter fits cell {cell} crossed by {x} and {y}",
+                        [x, y], cell
+                    )
+        return None
+
+    def check_arc_consistency(self):
+        """Enforce arc consistency and check no domain was emptied."""
+        if self.arc_consistency.propagate():
+            return None
+        for var in self.crossword_creator.crossword.variable_list:
+            if not self.crossword_creator.domains[var]:
+                return Infeasibility(
+                    Infeasibility.EMPTY_DOMAIN,
+                    f"no possible word for {var} after arc consistency", [var]
+                )
+        return None
+
+    def check_all_different(self):
+        """
+        Hall's condition for the "no word used twice" constraint: within each length class
+        the variables must be matched to distinct words of their domains.
+        If the maximum matching misses a variable, report the Hall violator it belongs to.
+        """
+        domains = self.crossword_creator.domains
+        for length, variables in sorted(self.length_classes().items()):
+            match, violators = max_matching([domains[var].bits for var in variables])
+            if violators:
+                violator = [variables[k] for k in sorted(violators[0])]
+                words = 0
+                for var in violator:
+                    words |= domains[var].bits
+                return Infeasibility(
+                    Infeasibility.ALL_DIFFERENT,
+                    f"{len(violator)} variables of length {length} share only {words.bit_count()} possible words",
+                    violator
+                )
+        return None
@@ -5,19 +5,42 @@ This File demonstrates solving the crossword problem using A* search Algorithms
 
 
 import sys
+import heapq
+import json
 
 from crossword import *
 from crossword_creator import *
 from util import PriorityQueue
 from util import Node
+from util import SearchState
+from util import SearchStats, Tracer
+from util import AnytimeResult, Budget, BudgetExceeded
+from feasibility import FeasibilityAnalyzer
+from heuristic import HeuristicEvaluator
+from matching import filter_all_different
+from solution_cache import MISS, default_cache
 import timeit
 
 
 class general_search():
 
-    def __init__(self, crossword_creator):
+    def __init__(self, crossword_creator, cache=None):
+        """
+        `cache` (a SolutionCache) answers `solve` from the initial state for a structure, vocabulary
+        and options solved before, before the domains are built, and keeps the answers found.
+        """
         self.crossword_creator=crossword_creator
         self._countActions=0
+        self.infeasibility=None
+        # variables having the same length, a word assigned to one of them can't be used by the others
+        self.same_length=crossword_creator.crossword.same_length()
+        self.heuristic=HeuristicEvaluator(self)
+        self.budget=None    # set by solve_anytime, checked at every expansion
+        self.best=None      # state with the most assigned variables expanded while a budget is set
+        self.stats=SearchStats()    # counters and phase timings of the last solve
+        self.tracer=None    # a util.Tracer sampling the expansions of the search
+        self.cache=cache
+        self.cached=False   # whether the last solve was answered by the cache
 
 
     @property
@@ -25,186 +48,373 @@ class general_search():
         return self._countActions
 
     @countActions.setter
-    def all_avaliable_actions(self):
-        self._countActions=len(self.get_actions(self.initial_state))
+    def countActions(self,value):
+        self._countActions=value
+
+    def count_all_avaliable_actions(self):
+        """
+        number of actions avaliable in the initial state, the baseline of the min conflict heuristic,
+        counted like the heuristic counts the actions of a state: the candidate words of each variable
+        without the all-different filtering of get_actions, so the heuristic never goes below 0
+        """
+        self.countActions=sum(self.heuristic.counts(self.initial_state))
 
 
     @property
     def initial_state(self):
-        return dict.fromkeys(self.crossword_creator.crossword.variables)
-
-    def enforce_node_consistency(self):
-        for var in self.crossword_creator.crossword.variables:
-            new_domain=[]
-            for word in self.crossword_creator.domains[var]:
-                if var.length == len(word):
-                    new_domain.append(word)
-            self.crossword_creator.domains[var]=new_domain
+        return SearchState.empty(len(self.crossword_creator.crossword.variable_list))
 
-    """
-        Check if there are m variables with length l then there should be m words or more that have length l 
-    """
+    def word_of(self,state,var):
+        """
+        return the word assigned to `var` in `state` or None
+        """
+        idx=state.word(var.id)
+        if idx is None:
+            return None
+        return self.crossword_creator.crossword.index.words_of_length(var.length)[idx]
 
-    def words_variables_consistency(self):
-        
-        max_len=-1
-        for word in self.crossword_creator.crossword.words:
-            if max_len<len(word):
-                max_len=len(word)
-        
-        occ_word=[0 for i in range(max_len+1)]
-        occ_variables=[0 for i in range(max_len+1)]
-
-        for var in self.crossword_creator.crossword.variables:
-            occ_variables[var.length]+=1
-        
-        for word in self.crossword_creator.crossword.words:
-            occ_word[len(word)]+=1
-
-
-        for idx,word in enumerate(occ_word):
-            if occ_variables[idx]>occ_word[idx]:
-                return None
-        return True 
+    def assignment(self,state):
+        """
+        convert a state to the mapping from variables to words used to print and save the crossword
+        """
+        return {var: self.word_of(state,var) for var in self.crossword_creator.crossword.variable_list
+                if state.word(var.id) is not None}
 
     def get_actions(self,state):
-        actions=list()
-        for var in state:
+        """
+        actions are (variable, index of the word in the bucket of the variable's length),
+        words that no matching of the unassigned variables of a length to distinct words can use are left out
+        """
+        self.stats.actions+=1
+        crossword=self.crossword_creator.crossword
+        index=crossword.index
+        masks=dict()    # length -> (unassigned variables, masks of their possible words)
+        for var in crossword.variable_list:
             """
             check if the variable is unassigned if yes choose for it an assignment
             """
-            if state[var]==None:
+            if state.word(var.id) is None:
                 """
                 conditions is a dict with index of chosen word as a key 
                 and value of the dict=word[index]
 
                 """
-                conditions=dict.fromkeys([i for i in range(var.length)])
+                conditions=dict()
                 """
                 get the all other variables that are overlapping with the variable "var"
                 I want to assigm value to 
                 """
-                overlaps_set=self.crossword_creator.crossword.neighbors(var)
-                for overlap_var in overlaps_set:
+                for other_id,i,j in crossword.adjacency[var.id]:
                     """
                     if the overlapping variables are assigned then the overlapping 
                     constraint between "var" and "overlap_var" must be satisified
                     """
-                    if state[overlap_var]!=None:
-                        overlap_idx=self.crossword_creator.crossword.overlaps[(var,overlap_var)]
-                        if conditions[overlap_idx[0]] == None or conditions[overlap_idx[0]]==state[overlap_var][overlap_idx[1]]:
-                            conditions[overlap_idx[0]]=state[overlap_var][overlap_idx[1]]
-                        else:
+                    letter=self.word_of(state,crossword.variable_list[other_id])
+                    if letter is not None:
+                        letter=letter[j]
+                        if conditions.get(i,letter)!=letter:
                             """
                             we can't proceed any more with this state because it requires 
                             different values for the same place of the variable
                             that means we reach a contradiction
                             """
                             return []
+                        conditions[i]=letter
 
-                # avaliable words for certain variables that won't voilate any constraint
-                avaliable_actions=[]
-                # get words from the domain that satisifies the conditions
-                for word in self.crossword_creator.domains[var]:
-                    valid=True
-                    # if the word is already assigned to another variable in we can't chose it 
-                    if word in state.values():
-                        continue
-                    for i in conditions:
-                        if conditions[i]!=None and conditions[i]!=word[i]:
-                            valid=False
-                            break
-                    """
-                    if this word satisifies all the conditions then it can be assigned to the variable
-                    so we will put as an valid action in the tuple of "avaliable_actions"
-                    """
-                    if valid==True:
-                        avaliable_actions.append(tuple([var,word]))
+                # get words from the domain that satisifies the conditions using the positional index
+                # and that are not already assigned to another variable
+                mask=index.pattern_mask(var.length,conditions) & self.crossword_creator.domains[var].bits
+                mask&=~state.used.get(var.length,0)
                 """
                 if there is no word in the domain of the unassigned variable that statisifies the condition 
                 then we reached a contradiction and we can't proceed with this state
 
                 """
-                if len(avaliable_actions)==0:
+                if not mask:
                     return []
-                else:
-                    actions.extend(avaliable_actions)
+                variables,bits=masks.setdefault(var.length,([],[]))
+                variables.append(var)
+                bits.append(mask)
 
+        actions=list()
+        for variables,bits in masks.values():
+            if len(variables)>1:
+                bits,_=filter_all_different(bits)
+                if bits is None:
+                    # the unassigned variables of this length can't all get distinct words
+                    return []
+            for var,mask in zip(variables,bits):
+                actions.extend((var,idx) for idx in iter_bits(mask))
         return actions
 
     
     
     def get_successor(self,state,action):
-        new_state=state.copy()
-        new_state[action[0]]=action[1]
-        return new_state
+        var,idx=action
+        return state.assign(var.id,idx,var.length)
+
+    def state_key(self,state):
+        """
+        canonical hashable form of a state, states hash and compare by the words of the variables
+        """
+        return state
 
     """
     check all variables are assigned 
      """
     def is_goal(self,state):
-        return all(state.values())
+        return state.assigned==len(self.crossword_creator.crossword.variable_list)
     
 
     """
     choose a state that results in a minimum number of conflicts with other variables.
     """
-    def min_conflict_heuristic(self,state):
+    def min_conflict_heuristic(self,state,parent=None,action=None):
         """
         return the number of actions that are avaliable in this state and choose the state that 
-        will be have mon conflicts with other states
+        will be have mon conflicts with other states.
+        When the parent state and the action leading to this state are given the number of actions
+        is updated incrementally from the parent's, values are cached by state (LRU).
         """
-        return self.countActions-len(self.get_actions(state))
+        if self.budget is not None:
+            self.budget.check()
+        return self.heuristic.evaluate(state,parent,action)
 
 
-    # A* search algorithm is used to solve the crossword as a search problem
-    def solve(self,state):
-        if self.is_goal(state):return[]
-        # remove all invalid words from domain i.e run node consistency
-        self.enforce_node_consistency()
-        valid=self.words_variables_consistency()
-        if valid==None:
+    ASTAR = "astar"
+    WEIGHTED_ASTAR = "weighted_astar"
+    BEAM = "beam"
+    DEPTH_FIRST = "depth_first"
+    STRATEGIES = (ASTAR, WEIGHTED_ASTAR, BEAM, DEPTH_FIRST)
+
+    # A* search algorithm (or one of its memory-bounded variants) is used to solve the crossword as a search problem
+    def solve(self,state,strategy=ASTAR,beam_width=100,epsilon=2.0):
+        """
+        `strategy` selects the search algorithm:
+        ASTAR keeps every generated node (the original algorithm),
+        WEIGHTED_ASTAR multiplies the heuristic by `epsilon`,
+        BEAM keeps only the `beam_width` best nodes of each depth and
+        DEPTH_FIRST only keeps the current path and the children of its nodes.
+        Every strategy ranks the nodes the same way, the highest first: the min conflict heuristic
+        grows as the state fills up (countActions minus the actions left), A* adds the cost to it.
+        The counters, the peak frontier size and the time of each phase are kept in `self.stats`.
+        With a cache the answer is looked up first and `self.cached` tells if it was found.
+        """
+        if strategy not in general_search.STRATEGIES:
+            raise ValueError(f"unknown search strategy {strategy!r}")
+        self.stats=SearchStats()
+        self.cached=False
+        key=self.cache_key(state,strategy,beam_width,epsilon)
+        if key is not None:
+            with self.stats.phase("cache"):
+                assignment=self.cache.lookup(key,self.crossword_creator.crossword)
+            if assignment is not MISS:
+                self.cached=True
+                return assignment
+        assignment=self.search(state,strategy,beam_width,epsilon)
+        if key is not None:
+            self.cache.store(key,self.crossword_creator.crossword,assignment)
+        return assignment
+
+    def search(self,state,strategy,beam_width,epsilon):
+        """
+        the uncached part of `solve`
+        """
+        evaluations,hits=self.heuristic.evaluations,self.heuristic.hits
+        try:
+            if self.is_goal(state):return self.assignment(state)
+            # remove all invalid words from domain i.e run node consistency and reject infeasible puzzles early
+            self.infeasibility=FeasibilityAnalyzer(self.crossword_creator,stats=self.stats).analyze()
+            if self.infeasibility is not None:
+                return None
+            with self.stats.phase("count_actions"):
+                self.count_all_avaliable_actions()
+            with self.stats.phase("search"):
+                if strategy==general_search.ASTAR:
+                    return self.astar(state,1)
+                if strategy==general_search.WEIGHTED_ASTAR:
+                    return self.astar(state,epsilon)
+                if strategy==general_search.BEAM:
+                    return self.beam_search(state,beam_width)
+                return self.depth_first(state)
+        finally:
+            self.stats.heuristic_evaluations+=self.heuristic.evaluations-evaluations
+            self.stats.heuristic_hits+=self.heuristic.hits-hits
+
+    def cache_key(self,state,strategy,beam_width,epsilon):
+        """
+        key of the solve in the cache, only a solve from the initial state of unreduced domains is cached,
+        the beam width and the weight are part of the key only for the strategies using them
+        """
+        if self.cache is None or state.assigned or self.crossword_creator.has_domains():
             return None
+        options={"strategy": strategy}
+        if strategy==general_search.BEAM:
+            options["beam_width"]=beam_width
+        if strategy==general_search.WEIGHTED_ASTAR:
+            options["epsilon"]=epsilon
+        return self.cache.key(self.crossword_creator.crossword,"general_search",options)
+
+    def solve_anytime(self,state,strategy=ASTAR,beam_width=100,epsilon=2.0,time_limit=None,node_limit=None,token=None):
+        """
+        `solve` within `time_limit` seconds and `node_limit` expanded nodes, `token` (a CancellationToken)
+        stops the search when it is cancelled. Return an AnytimeResult holding the solution,
+        or the assignment of the expanded state filling the most slots if the budget ran out first.
+        """
+        self.budget=Budget(time_limit,node_limit,token)
+        self.best=state
+        try:
+            assignment=self.solve(state,strategy,beam_width,epsilon)
+            status=AnytimeResult.SOLVED if assignment is not None else AnytimeResult.NO_SOLUTION
+        except BudgetExceeded as exceeded:
+            assignment=self.assignment(self.best)
+            status=exceeded.reason
+        stats=self.stats.as_dict()
+        stats["elapsed"]=self.budget.elapsed()
+        self.budget=None
+        return AnytimeResult(status,assignment,stats)
+
+    def expand(self,node):
+        """
+        return the (action, successor state) pairs of a node
+        """
+        if self.budget is not None:
+            self.budget.spend()
+            if node.state.assigned>self.best.assigned:
+                self.best=node.state
+        self.stats.nodes_expanded+=1
+        if self.tracer is not None:
+            self.tracer.sample("expand",depth=node.cost,assigned=node.state.assigned)
+        successors=[(action,self.get_successor(node.state,action)) for action in self.get_actions(node.state)]
+        self.stats.nodes_generated+=len(successors)
+        return successors
+
+    def astar(self,state,weight):
+        """
+        A* where the priority of a node is its cost plus `weight` times the min conflict heuristic,
+        the frontier pops the highest priority first
+        """
         frontier=PriorityQueue()
         start_Node=Node(state,0)
-        frontier.push(self.min_conflict_heuristic(start_Node.state),start_Node)
-        exploredSet=[]
+        frontier.push(weight*self.min_conflict_heuristic(start_Node.state),start_Node,self.state_key(state))
+        # explored states are kept by their canonical key so that membership is O(1)
+        exploredSet=set()
 
         while frontier.empty() is False:
             node=frontier.pop()
             if self.is_goal(node.state):
-                return node.state
+                return self.assignment(node.state)
             else:
-                exploredSet.append(node.state)
-                actions=self.get_actions(node.state)
-                for action in actions:
-                    successor=self.get_successor(node.state,action)
-                    if successor not in exploredSet and not frontier.contains_state(successor):
-                        priority=self.min_conflict_heuristic(successor)+node.cost+1
+                exploredSet.add(self.state_key(node.state))
+                for action,successor in self.expand(node):
+                    key=self.state_key(successor)
+                    if key not in exploredSet:
+                        priority=weight*self.min_conflict_heuristic(successor,node.state,action)+node.cost+1
                         successor_Node=Node(successor,node.cost+1)
-                        frontier.push(priority,successor_Node)
+                        # already queued states are only replaced if reached with a better priority
+                        frontier.push(priority,successor_Node,key)
+                self.stats.frontier(len(frontier))
+        return None
+
+    def is_dead_end(self,state,heuristic):
+        """
+        a state that isn't a goal and has no avaliable action, its heuristic is then countActions
+        """
+        return heuristic==self.countActions and not self.is_goal(state)
+
+    def beam_search(self,state,beam_width):
+        """
+        breadth first search keeping only the `beam_width` nodes with the highest min conflict heuristic
+        at each depth (the ones A* would pop first), memory is bounded by beam_width times the
+        branching factor but a solution may be missed
+        """
+        layer=[Node(state,0)]
+        while layer:
+            candidates=[]
+            seen=set()  # duplicates are only detected inside the next layer, every state of a layer has the same depth
+            for node in layer:
+                if self.is_goal(node.state):
+                    return self.assignment(node.state)
+                for action,successor in self.expand(node):
+                    if successor in seen:
+                        continue
+                    seen.add(successor)
+                    heuristic=self.min_conflict_heuristic(successor,node.state,action)
+                    if not self.is_dead_end(successor,heuristic):
+                        candidates.append((heuristic,Node(successor,node.cost+1)))
+            self.stats.frontier(len(candidates))
+            layer=[node for _,node in heapq.nsmallest(beam_width,candidates,key=lambda item:(-item[0],item[1].seq))]
+        return None
+
+    def depth_first(self,state):
+        """
+        depth first search pruning the dead ends, children are tried by decreasing min conflict heuristic.
+        Every goal is at the depth of the number of variables and every action costs 1, so the cost left
+        is exactly the number of unassigned variables: IDA* would never go past its first bound,
+        which is this search. Memory is the current path and the children of the nodes on it.
+        """
+        stack=[iter([Node(state,0)])]
+        held=1  # nodes generated and not yet tried, i.e. the frontier of the depth first search
+        while stack:
+            node=next(stack[-1],None)
+            if node is None:
+                stack.pop()
+                self.stats.backtracks+=1
+                continue
+            held-=1
+            if self.is_goal(node.state):
+                return self.assignment(node.state)
+            children=[]
+            for action,successor in self.expand(node):
+                heuristic=self.min_conflict_heuristic(successor,node.state,action)
+                if not self.is_dead_end(successor,heuristic):
+                    children.append((heuristic,Node(successor,node.cost+1)))
+            children.sort(key=lambda item:(-item[0],item[1].seq))
+            held+=len(children)
+            self.stats.frontier(held)
+            stack.append(iter([child for _,child in children]))
+        return None
 
 
 def main():
+    # --stats prints the search statistics, --trace=FILE writes a sampled trace of the search
+    # --no-cache solves without the solution cache, which is also skipped with --stats or --trace
+    # since an answer found in the cache has no statistics and no trace
+    show_stats = "--stats" in sys.argv
+    trace = next((arg.split("=", 1)[1] for arg in sys.argv if arg.startswith("--trace=")), None)
+    use_cache = "--no-cache" not in sys.argv and not show_stats and trace is None
+    args = [arg for arg in sys.argv[1:] if not arg.startswith("--")]
+
     # Check usage
-    if len(sys.argv) not in [3, 4]:
-        sys.exit("Usage: python generate.py structure words [output]")
+    if len(args) not in [2, 3]:
+        sys.exit("Usage: python generate.py structure words [output] [--stats] [--trace=FILE] [--no-cache]")
 
     # Parse command-line arguments
-    structure = sys.argv[1]
-    words = sys.argv[2]
-    output = sys.argv[3] if len(sys.argv) == 4 else None
+    structure = args[0]
+    words = args[1]
+    output = args[2] if len(args) == 3 else None
     # structure='data\structure6.txt'
     # words='data\words2.txt'
     # Generate crossword
     crossword = Crossword(structure, words)
     creator = CrosswordCreator(crossword)
-    search_problem=general_search(creator)
+    search_problem=general_search(creator, cache=default_cache() if use_cache else None)
     initial_state=search_problem.initial_state
+    trace_file = open(trace, "w") if trace else None
+    if trace_file is not None:
+        search_problem.tracer = Tracer(trace_file)
     start = timeit.default_timer()
-    assignment = search_problem.solve(initial_state)
+    try:
+        assignment = search_problem.solve(initial_state)
+    finally:
+        if trace_file is not None:
+            trace_file.close()
     stop = timeit.default_timer()
     print('Time Taken to solve the problem: ', stop - start)
+    if search_problem.cached:
+        print("Answer found in the solution cache.")
+    if show_stats:
+        print(json.dumps(search_problem.stats.as_dict(), indent=1))
 
     # Print result
     if assignment is None:
@@ -0,0 +1,107 @@
+"""
+This File contains the `HeuristicEvaluator` class which computes the min-conflict heuristic of
+`general_search` incrementally: the number of candidate words of every unassigned variable
+is derived from the parent's counts, and the results are memoized in a bounded LRU cache.
+"""
+
+from collections import OrderedDict
+
+
+class HeuristicEvaluator():
+
+    def __init__(self, search_problem, cache_size=100000):
+        self.search_problem = search_problem
+        self.crossword_creator = search_problem.crossword_creator
+        self.crossword = search_problem.crossword_creator.crossword
+        self.cache_size = cache_size
+        # state key -> (heuristic, counts), counts[var id] is the number of candidate words of
+        # the variable in that state (None if it is assigned)
+        self.cache = OrderedDict()
+        self.evaluations = 0    # heuristic values computed (cache misses)
+        self.hits = 0           # heuristic values found in the cache
+
+    def candidates(self, state, var):
+        """
+        Return the bitmask of the words that can still be assigned to the unassigned `var` in `state`:
+        words of its domain matching the letters of its assigned neighbours and not used already.
+        """
+        crossword = self.crossword
+        index = crossword.index
+        mask = self.crossword_creator.domains[var].bits
+        for other_id, i, j in crossword.adjacency[var.id]:
+            word = self.search_problem.word_of(state, crossword.variable_list[other_id])
+            if word is not None:
+                mask &= index.mask_with(var.length, i, word[j])
+                if not mask:
+                    return 0
+        return mask & ~state.used.get(var.length, 0)
+
+    def counts(self, state):
+        """Compute the candidate counts of all the variables of `state` from scratch."""
+        return [
+            None if state.word(var.id) is not None else self.candidates(state, var).bit_count()
+            for var in self.crossword.variable_list
+        ]
+
+    def child_counts(self, parent_counts, state, action):
+        """
+        Derive the candidate counts of `state` from the counts of its parent, `action` = (var, word)
+        (word being the index of the word in its length bucket) being the assignment that leads from the parent to `state`. Only the neighbours of `var`
+        are recomputed, the other variables of the same length lose `word` if it was a candidate.
+        """
+        crossword = self.crossword
+        index = crossword.index
+        var, word = action
+        counts = list(parent_counts)
+        counts[var.id] = None
+        neighbors = set()
+        for other_id, _, _ in crossword.adjacency[var.id]:
+            neighbors.add(other_id)
+            if counts[other_id] is not None:
+                counts[other_id] = self.candidates(state, crossword.variable_list[other_id]).bit_count()
+        bit = 1 << word
+        for other in self.search_problem.same_length[var]:
+            if counts[other.id] and other.id not in neighbors and self.candidates_contain(state, other, bit):
+                counts[other.id] -= 1
+        return counts
+
+    def candidates_contain(self, state, var, bit):
+        """Check if the word of bit `bit` (of var's length) was a candidate of `var` before being used."""
+        crossword = self.crossword
+        index = crossword.index
+        if not self.crossword_creator.domains[var].bits & bit:
+            return False
+        for other_id, i, j in crossword.adjacency[var.id]:
+            word = self.search_problem.word_of(state, crossword.variable_list[other_id])
+            if word is not None and not index.mask_with(var.length, i, word[j]) & bit:
+                return False
+        return True
+
+    def evaluate(self, state, parent=None, action=None):
+        """
+        Return the min-conflict heuristic of `state`: countActions minus the number of actions
+        available in it (no action at all if some unassigned variable has no candidate), both count
+        the candidate words of the variables without the all-different filtering of get_actions.
+        When `parent` and `action` are given, the counts are derived from the parent's cached ones.
+        """
+        key = self.search_problem.state_key(state)
+        cached = self.cache.get(key)
+        if cached is not None:
+            self.hits += 1
+            self.cache.move_to_end(key)
+            return cached[0]
+        self.evaluations += 1
+        parent_entry = None
+        if parent is not None:
+            parent_entry = self.cache.get(self.search_problem.state_key(parent))
+        if parent_entry is not None:
+            counts = self.child_counts(parent_entry[1], state, action)
+        else:
+            counts = self.counts(state)
+        available = [count for count in counts if count is not None]
+        actions = 0 if 0 in available else sum(available)
+        heuristic = self.search_problem.countActions - actions
+        self.cache[key] = (heuristic, counts)
+        if len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+        return heuristic
@@ -0,0 +1,244 @@
+"""
+This File contains the incremental solver used by an editor: cells of the grid are opened or blocked
+and words are added to or removed from the dictionary between solves. Only what an edit touches is
+computed again: the dictionary is edited in place (the ids of the other words don't change, so domains
+stay valid), the arc consistent domains of the regions untouched by an edit are kept, and the search
+starts from the previous solution, freeing the slots around the edits ring by ring until a solution is found.
+"""
+
+import sys
+import timeit
+
+from crossword import *
+from crossword_creator import *
+from CSP import CSP
+from components import components
+from feasibility import FeasibilityAnalyzer
+from util import Budget, BudgetExceeded
+
+
+class EditableIndex(WordIndex):
+
+    def __init__(self, words):
+        """
+        WordIndex whose vocabulary can be edited. Added words are appended to their bucket and removed
+        words stay in it with their bits cleared from the masks, so the id of a word never changes
+        and bitmasks computed before an edit keep meaning the same words.
+        `live[length]` is the bitmask of the words of the bucket that are in the vocabulary.
+        """
+        super().__init__(words)
+        self.live = {length: (1 << len(bucket)) - 1 for length, bucket in self.by_length.items()}
+
+    def full_mask(self, length):
+        return self.live.get(length, 0)
+
+    def fingerprint(self):
+        # buckets hold removed words and aren't sorted once words are added, hash the vocabulary itself
+        if self._fingerprint is None:
+            buckets = dict()
+            for word in self.words:
+                buckets.setdefault(len(word), []).append(word)
+            self._fingerprint = vocabulary_fingerprint((length, sorted(buckets[length])) for length in sorted(buckets))
+        return self._fingerprint
+
+    def add(self, words):
+        """Add `words` to the vocabulary, return a mapping from a length to the bitmask of the words added."""
+        self._fingerprint = None
+        added = dict()
+        appended = dict()   # length -> words new to the bucket
+        for word in words:
+            if word in self.words:
+                continue
+            self.words.add(word)
+            length = len(word)
+            ids = self.ids.setdefault(length, dict())
+            idx = ids.get(word)
+            if idx is None:
+                bucket = appended.setdefault(length, [])
+                idx = ids[word] = len(self.by_length.get(length, ())) + len(bucket)
+                bucket.append(word)
+            bit = 1 << idx
+            for position, letter in enumerate(word):
+                self.masks[length, position, letter] = self.masks.get((length, position, letter), 0) | bit
+                letters = self.letters.get((length, position), ())
+                if letter not in letters:
+                    self.letters[length, position] = tuple(sorted(letters + (letter,)))
+            added[length] = added.get(length, 0) | bit
+        for length, bucket in appended.items():
+            self.by_length[length] = self.by_length.get(length, ()) + tuple(bucket)
+        for length, mask in added.items():
+            self.live[length] = self.live.get(length, 0) | mask
+        return added
+
+    def remove(self, words):
+        """Remove `words` from the vocabulary, return a mapping from a length to the bitmask of the words removed."""
+        self._fingerprint = None
+        removed = dict()
+        for word in words:
+            if word not in self.words:
+                continue
+            self.words.discard(word)
+            length = len(word)
+            bit = 1 << self.ids[length][word]
+            for position, letter in enumerate(word):
+                self.masks[length, position, letter] &= ~bit
+            removed[length] = removed.get(length, 0) | bit
+        for length, mask in removed.items():
+            self.live[length] &= ~mask
+        return removed
+
+
+class IncrementalSolver():
+
+    def __init__(self, contents, words, inference=CSP.MAC, step_nodes=200):
+        """
+        Solver of the crossword whose structure is given by the lines `contents` ("_" open, "#" blocked)
+        with the vocabulary `words`, kept up to date by the edit methods.
+        Each step of the repair that keeps some slots fixed gives up after `step_nodes` nodes.
+        `solution` is the last solution found (None before the first solve or if there was none)
+        and `csp` the CSP of the last solve, with its statistics.
+        """
+        width = max(len(line) for line in contents)
+        self.grid = [list(line.ljust(width, "#")) for line in contents]
+        self.index = EditableIndex(word.upper() for word in words)
+        self.inference = inference
+        self.step_nodes = step_nodes
+        self.crossword = Crossword.from_lines(self.lines(), self.index)
+        self.root = dict()      # variable -> arc consistent domain bits found by the last solve
+        self.solution = None
+        self.csp = None
+
+    def lines(self):
+        return ["".join(row) for row in self.grid]
+
+    def set_cell(self, i, j, open_cell):
+        """Open (`open_cell` True) or block the cell (i, j)."""
+        cell = "_" if open_cell else "#"
+        if self.grid[i][j] != cell:
+            self.grid[i][j] = cell
+            self.rebuild()
+
+    def toggle(self, i, j):
+        """Open the cell (i, j) if it is blocked, block it otherwise."""
+        self.set_cell(i, j, self.grid[i][j] != "_")
+
+    def rebuild(self):
+        """
+        Compute the slots of the edited structure (a linear scan of the cells) and keep the domains
+        of the regions where no slot and no crossing changed, the others are arc consistent again at the next solve.
+        Slots are compared by position so the unchanged ones keep their domains and words.
+        """
+        old = self.crossword
+        self.crossword = Crossword.from_lines(self.lines(), self.index)
+        previous = {var: var for var in old.variable_list}
+        changed = set()
+        for var in self.crossword.variable_list:
+            before = previous.get(var)
+            if before is None or set(self.crossword.neighbors(var)) != set(old.neighbors(before)):
+                changed.add(var.id)
+        root = dict()
+        for var_ids in components(self.crossword):
+            if changed.isdisjoint(var_ids):
+                for var_id in var_ids:
+                    var = self.crossword.variable_list[var_id]
+                    if var in self.root:
+                        root[var] = self.root[var]
+        self.root = root
+
+    def add_words(self, words):
+        """
+        Add `words` to the dictionary, the previous solution is still one but the
+        domains have to grow again so they are made arc consistent from scratch.
+        """
+        if self.index.add(word.upper() for word in words):
+            self.root = dict()
+
+    def remove_words(self, words):
+        """
+        Remove `words` from the dictionary, they are also removed from the kept domains
+        (arc consistency only removes more words) and the slots using them are freed at the next solve.
+        """
+        removed = self.index.remove(word.upper() for word in words)
+        for var, bits in self.root.items():
+            self.root[var] = bits & ~removed.get(var.length, 0)
+
+    def solve(self):
+        """
+        Solve the edited crossword, return the assignment or None.
+        The slots whose word is no longer possible are freed and everything else keeps its previous word,
+        if there is no solution like that the slots crossing the freed ones are freed too, and so on:
+        every step searches only over the freed slots (trying their previous words first),
+        within `step_nodes` nodes since proving that the fixed words leave no solution can be long,
+        and the last one frees every slot and has no limit so the answer is exact.
+        """
+        crossword = self.crossword
+        creator = CrosswordCreator(crossword)
+        creator.restore({var: bits for var, bits in self.root.items() if var in creator.domains})
+        self.csp = csp = CSP(creator, self.inference)
+        csp.infeasibility = FeasibilityAnalyzer(creator, csp.arc_consistency).analyze()
+        if csp.infeasibility is not None:
+            self.root = dict()
+            self.solution = None
+            return None
+        self.root = creator.snapshot()
+
+        previous = self.solution or dict()
+        csp.hints = previous
+        base = csp.counters()
+        domains = creator.domains
+        freed = {var for var in crossword.variable_list
+                 if previous.get(var) is None or previous[var] not in domains[var]}
+        while True:
+            fixed = {var: previous[var] for var in crossword.variable_list if var not in freed}
+            csp.budget = Budget(node_limit=self.step_nodes) if fixed else None
+            try:
+                with csp.stats.phase("search"):
+                    solution = csp.backtrack(fixed)
+            except BudgetExceeded:
+                solution = None
+            finally:
+                csp.budget = None
+            if solution is not None or not fixed:
+                break
+            ring = {neighbor for var in freed for neighbor in crossword.neighbors(var)} | freed
+            # the freed slots are a whole region: what is left fixed in the others can only conflict by its words
+            freed = ring if ring != freed else set(crossword.variable_list)
+        csp.collect_stats(base)
+        self.solution = solution
+        return solution
+
+
+def main():
+
+    # Check usage
+    if len(sys.argv) not in [5, 6]:
+        sys.exit("Usage: python incremental.py structure words i j [words to remove]")
+
+    # Parse command-line arguments
+    structure = sys.argv[1]
+    words = sys.argv[2]
+    i, j = int(sys.argv[3]), int(sys.argv[4])
+    removed = sys.argv[5].split(",") if len(sys.argv) == 6 else []
+
+    # Solve, then toggle the cell (i, j), remove the words and solve again
+    with open(structure) as f:
+        contents = f.read().splitlines()
+    with open(words) as f:
+        vocabulary = f.read().split()
+    solver = IncrementalSolver(contents, vocabulary)
+    for step in ("initial", "edited"):
+        if step == "edited":
+            solver.toggle(i, j)
+            solver.remove_words(removed)
+        start = timeit.default_timer()
+        assignment = solver.solve()
+        stop = timeit.default_timer()
+        print(f'Time Taken to solve the {step} problem: ', stop - start)
+        if assignment is None:
+            print("No solution.")
+        else:
+            CrosswordCreator(solver.crossword).print(assignment)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,231 @@
+"""
+This File contains the bipartite matching between variables and words used to reason about
+the "no word used twice" constraint, domains are given as bitmasks over the same length bucket.
+`filter_all_different` removes the words that no matching can give to a variable (Régin's filtering)
+and `AllDifferent` applies it to the domains of a CrosswordCreator during search.
+"""
+
+from collections import deque
+
+from crossword import iter_bits
+
+
+def max_matching(domains, hint=None):
+    """
+    Compute a maximum matching between the variables (positions in the list `domains`)
+    and the words (bits of the bitmasks) of their domains.
+    Return (match, violators), `match[k]` is the word matched to the k-th variable or None
+    and `violators` is a list of Hall violators, i.e. sets of variables positions whose domains
+    together contain fewer words than there are variables, one for each unmatched variable.
+    `hint` is a previous matching, its pairs still allowed by the domains are kept.
+    """
+    match = [None] * len(domains)
+    owner = dict()      # word -> position of the variable it is matched to
+    matched = 0         # bitmask of the matched words
+    if hint is not None:
+        for k, word in enumerate(hint):
+            if word is not None and (domains[k] >> word) & 1 and word not in owner:
+                match[k] = word
+                owner[word] = k
+                matched |= 1 << word
+    # most variables get a free word directly, only the others need an augmenting path
+    for k, bits in enumerate(domains):
+        if match[k] is not None:
+            continue
+        free = bits & ~matched
+        if free:
+            word = (free & -free).bit_length() - 1
+            match[k] = word
+            owner[word] = k
+            matched |= 1 << word
+    violators = []
+    for k in range(len(domains)):
+        if match[k] is not None:
+            continue
+        reached = augment(domains, match, owner, k)
+        if reached is not None:
+            violators.append(reached)
+    return match, violators
+
+
+def augment(domains, match, owner, start):
+    """
+    Look for an augmenting path from the unmatched variable `start` (breadth first) and apply it.
+    Return None on success, otherwise the set of variables reached by alternating paths
+    which is a Hall violator (all the words of their domains are matched to the others).
+    """
+    visited = 0
+    came_from = dict()   # word -> variable it was reached from
+    reached = {start}
+    queue = deque([start])
+    while queue:
+        k = queue.popleft()
+        candidates = domains[k] & ~visited
+        visited |= candidates
+        for word in iter_bits(candidates):
+            came_from[word] = k
+            if word not in owner:
+                # flip the matching along the path back to start
+                while True:
+                    var = came_from[word]
+                    previous = match[var]
+                    match[var] = word
+                    owner[word] = var
+                    if var == start:
+                        return None
+                    word = previous
+            nxt = owner[word]
+            if nxt not in reached:
+                reached.add(nxt)
+                queue.append(nxt)
+    return reached
+
+
+def filter_all_different(domains, hint=None):
+    """
+    Régin's filtering of the all-different constraint over the variables of `domains` (bitmasks):
+    a word stays in a variable's domain only if some maximum matching gives it to the variable.
+    Return (filtered domains, matching), or (None, Hall violator) if no matching covers every variable.
+
+    With the matched edges going from variables to words and the others from words to variables,
+    an edge belongs to some maximum matching iff it is matched, lies on an alternating path starting
+    from a free (unmatched) word, or both its ends are in the same strongly connected component.
+    Words are represented by the variables they are matched to: variable X leads to Y when the word
+    matched to X is in Y's domain. Y can take the word of X if X is reached from a free word or if
+    X and Y are in the same component.
+    """
+    match, violators = max_matching(domains, hint)
+    if violators:
+        return None, violators[0]
+    size = len(domains)
+    owned = [1 << word for word in match]
+    union = 0
+    for bits in domains:
+        union |= bits
+    # words reachable from a free word by alternating paths (free words included)
+    reachable = union & ~sum(owned)
+    reached = [False] * size
+    progress = True
+    while progress:
+        progress = False
+        for k in range(size):
+            if not reached[k] and domains[k] & reachable:
+                reached[k] = True
+                reachable |= owned[k]
+                progress = True
+    rest = [k for k in range(size) if not reached[k]]
+    components = strongly_connected(rest, lambda x: [y for y in rest if y != x and domains[y] & owned[x]])
+    words = dict()      # component -> words matched to its variables
+    for k in rest:
+        words[components[k]] = words.get(components[k], 0) | owned[k]
+    filtered = [bits & reachable if reached[k] else bits & (reachable | words[components[k]])
+                for k, bits in enumerate(domains)]
+    return filtered, match
+
+
+def strongly_connected(nodes, successors):
+    """Return a mapping from each of `nodes` to the number of its strongly connected component (Tarjan, iterative)."""
+    index = dict()
+    low = dict()
+    component = dict()
+    stack = []
+    on_stack = set()
+    count = 0
+    for root in nodes:
+        if root in index:
+            continue
+        index[root] = low[root] = len(index)
+        stack.append(root)
+        on_stack.add(root)
+        work = [(root, iter(successors(root)))]
+        while work:
+            node, children = work[-1]
+            child = next(children, None)
+            if child is not None:
+                if child not in index:
+                    index[child] = low[child] = len(index)
+                    stack.append(child)
+                    on_stack.add(child)
+                    work.append((child, iter(successors(child))))
+                elif child in on_stack:
+                    low[node] = min(low[node], index[child])
+                continue
+            work.pop()
+            if work:
+                parent = work[-1][0]
+                low[parent] = min(low[parent], low[node])
+            if low[node] == index[node]:
+                while True:
+                    member = stack.pop()
+                    on_stack.discard(member)
+                    component[member] = count
+                    if member == node:
+                        break
+                count += 1
+    return component
+
+
+class AllDifferent():
+
+    def __init__(self, crossword_creator, trail=None):
+        """
+        Propagator of the "no word used twice" constraint over the domains of `crossword_creator`,
+        one all-different constraint per length class having at least two variables.
+        Domain changes are saved in `trail` (when set) so that search can undo them.
+        The domains of each class after its last filtering and the matching found are kept:
+        a class whose domains didn't change is at its fixpoint and is skipped, and the matching
+        is repaired rather than computed again. Both only depend on the domains so undoing is safe.
+        """
+        self.crossword_creator = crossword_creator
+        self.trail = trail
+        self.classes = dict()
+        for var in crossword_creator.crossword.variable_list:
+            self.classes.setdefault(var.length, []).append(var)
+        self.classes = {length: variables for length, variables in self.classes.items() if len(variables) > 1}
+        self.fixpoints = dict()     # length -> domains of the class after its last filtering
+        self.matches = dict()       # length -> matching found by the last filtering
+        self.violator = None        # variables of the Hall violator found the last time propagate failed
+        self.filterings = 0         # number of classes filtered
+        self.prunes = 0             # number of words removed from the domains
+
+    def filter(self, length):
+        """
+        Filter the domains of the class `length`,
+        return the list of the variables whose domain changed or None if the class has no matching.
+        """
+        variables = self.classes[length]
+        domains = [self.crossword_creator.domains[var] for var in variables]
+        current = tuple(domain.bits for domain in domains)
+        if self.fixpoints.get(length) == current:
+            return []
+        self.filterings += 1
+        filtered, match = filter_all_different(current, self.matches.get(length))
+        if filtered is None:
+            self.violator = [variables[k] for k in sorted(match)]
+            return None
+        self.matches[length] = match
+        self.fixpoints[length] = tuple(filtered)
+        changed = []
+        for var, domain, bits in zip(variables, domains, filtered):
+            if bits != domain.bits:
+                self.prunes += domain.bits.bit_count() - bits.bit_count()
+                if self.trail is not None:
+                    self.trail.save(domain)
+                domain.bits = bits
+                changed.append(var)
+        return changed
+
+    def propagate(self, lengths=None):
+        """
+        Filter the classes `lengths` (all of them by default),
+        return the variables whose domain changed or None if some class has no matching.
+        """
+        changed = []
+        for length in self.classes if lengths is None else lengths:
+            if length not in self.classes:
+                continue
+            result = self.filter(length)
+            if result is None:
+                return None
+            changed.extend(result)
+        return changed
@@ -0,0 +1,132 @@
+"""
+This File contains the variable orderings of the CSP solver, both pick from a lazy heap: `Mrv` the variable
+with the fewest remaining values and `DomWdeg` the one with the smallest domain size / weighted degree,
+the weights of the constraints grow with the failures they cause. It also contains the restart schedules (Luby and geometric).
+"""
+
+import heapq
+from functools import cached_property
+
+
+class Restart(Exception):
+    """Raised by the search when the failures of the current run reach the cutoff."""
+
+
+def luby(i):
+    """Return the i-th term (i >= 1) of the Luby sequence 1 1 2 1 1 2 4 1 1 2 1 1 2 4 8 ..."""
+    k = 1
+    while (1 << k) - 1 < i:
+        k += 1
+    if (1 << k) - 1 == i:
+        return 1 << (k - 1)
+    return luby(i - (1 << (k - 1)) + 1)
+
+
+def geometric(i, factor=1.5):
+    """Return the i-th term (i >= 1) of the geometric sequence 1 1.5 2.25 ..."""
+    return factor ** (i - 1)
+
+
+class HeapOrdering():
+
+    COMPACT = 4
+
+    def __init__(self, crossword_creator, tiebreak):
+        """
+        Variable ordering picking the unassigned variable with the smallest `score` from a lazy heap.
+        `tiebreak` maps a variable to the rank breaking the ties between equal scores.
+        """
+        crossword = crossword_creator.crossword
+        self.crossword_creator = crossword_creator
+        self.tiebreak = [tiebreak[var] for var in crossword.variable_list]
+        """
+        Lazy heap of (score, variable id): when `select` starts, every unassigned variable has an entry
+        whose score is at most its current one. A decrease (domain reduced, weight raised) only adds
+        the variable to `changed` and `select` pushes one new entry for each of them, however many times
+        their domain was reduced, then fixes the outdated entries it meets (domains grow again when undone).
+        Once the heap holds more than COMPACT times as many entries as there are variables,
+        it is rebuilt with one up-to-date entry per variable so it doesn't grow with the search.
+        """
+        self.heap = []
+        self.changed = set()
+        self.compact_size = HeapOrdering.COMPACT * max(len(crossword.variable_list), 16)
+
+    @cached_property
+    def domains(self):
+        # looked up when the search first needs them, not when the solver is created
+        creator = self.crossword_creator
+        return [creator.domains[var] for var in creator.crossword.variable_list]
+
+    def score(self, var_id):
+        raise NotImplementedError
+
+    def reset(self, var_ids):
+        """Rebuild the heap with the variables `var_ids` (the unassigned ones)."""
+        self.heap = [(self.score(var_id), var_id) for var_id in var_ids]
+        heapq.heapify(self.heap)
+        self.changed.clear()
+
+    def push(self, var_id):
+        """Record that the score of the variable may have decreased (or that it is unassigned again)."""
+        self.changed.add(var_id)
+
+    def bump(self, id1, id2):
+        """Record that the constraint between the two variables emptied a domain, only DomWdeg uses it."""
+
+    def select(self, is_assigned):
+        """Return the id of the unassigned variable with the smallest score, None if all are assigned."""
+        if self.changed:
+            if len(self.heap) + len(self.changed) > self.compact_size:
+                self.reset(self.changed.union(var_id for _, var_id in self.heap))
+            else:
+                for var_id in self.changed:
+                    heapq.heappush(self.heap, (self.score(var_id), var_id))
+                self.changed.clear()
+        heap = self.heap
+        while heap:
+            score, var_id = heap[0]
+            if is_assigned(var_id):
+                heapq.heappop(heap)
+                continue
+            current = self.score(var_id)
+            if current != score:
+                heapq.heapreplace(heap, (current, var_id))
+                continue
+            return var_id
+        return None
+
+
+class Mrv(HeapOrdering):
+
+    def __init__(self, crossword_creator, tiebreak):
+        """Fewest remaining values first, then the highest degree (number of overlaps)."""
+        super().__init__(crossword_creator, tiebreak)
+        self.degree = [len(neighbors) for neighbors in crossword_creator.crossword.adjacency]
+
+    def score(self, var_id):
+        return (len(self.domains[var_id]), -self.degree[var_id], self.tiebreak[var_id])
+
+
+class DomWdeg(HeapOrdering):
+
+    def __init__(self, crossword_creator, tiebreak):
+        """
+        The weight of a constraint (a pair of variable ids: an overlap, or two variables of the same
+        length competing for a word) starts at 1 and grows each time it empties a domain.
+        wdeg[id] is 1 plus the weights of the constraints of the variable (the overlaps at first).
+        """
+        super().__init__(crossword_creator, tiebreak)
+        self.weights = dict()
+        self.wdeg = [1 + len(neighbors) for neighbors in crossword_creator.crossword.adjacency]
+
+    def score(self, var_id):
+        return (len(self.domains[var_id]) / self.wdeg[var_id], self.tiebreak[var_id])
+
+    def bump(self, id1, id2):
+        """Raise the weight of the constraint between the two variables after it emptied a domain."""
+        key = (id1, id2) if id1 < id2 else (id2, id1)
+        self.weights[key] = self.weights.get(key, 1) + 1
+        self.wdeg[id1] += 1
+        self.wdeg[id2] += 1
+        self.push(id1)
+        self.push(id2)
@@ -0,0 +1,257 @@
+"""
+This File demonstrates solving the crossword problem with the CSP backtracking search split over
+several processes: the search tree is cut at shallow depths into subtrees (tasks) and busy workers
+give some of their unexplored subtrees away whenever another worker is idle (work stealing).
+"""
+
+import sys
+import multiprocessing
+import queue
+import timeit
+
+from crossword import *
+from crossword_creator import *
+from CSP import CSP
+from feasibility import FeasibilityAnalyzer
+
+
+class SplittingCSP(CSP):
+
+    def __init__(self, crossword_creator, inference=CSP.MAC, hungry=None, share=None, check_interval=64):
+        """
+        CSP whose search can give away the subtrees it hasn't explored yet.
+        Every `check_interval` nodes `hungry()` is asked how many subtrees are wanted and the
+        shallowest open ones are handed to `share(tasks)`. A task is (key, assignment) where the
+        assignment is a list of (variable id, word) and the key orders the tasks like the
+        sequential search would visit them.
+        """
+        super().__init__(crossword_creator, inference)
+        self.hungry = hungry
+        self.share = share
+        self.check_interval = check_interval
+        self.nodes = 0
+        self.base_key = ()
+        self.base = []
+        # one frame [var, ordered values, position of the next value to try] for each level of the search
+        self.frames = []
+
+    def solve_task(self, key, assignment):
+        """Search the subtree of the task (key, assignment), return the solution or None."""
+        variables = self.crossword_creator.crossword.variable_list
+        self.base_key = key
+        self.base = assignment
+        return self.maintain_backtrack({variables[var_id]: word for var_id, word in assignment})
+
+    def path(self, depth):
+        """Return the key and the assignment of the values currently tried in the first `depth` frames."""
+        frames = self.frames[:depth]
+        key = self.base_key + tuple(frame[2] - 1 for frame in frames)
+        assignment = self.base + [(frame[0].id, frame[1][frame[2] - 1]) for frame in frames]
+        return key, assignment
+
+    def give_away(self):
+        """Hand the untried values of the shallowest frame having some to the idle workers."""
+        wanted = self.hungry()
+        if not wanted:
+            return
+        for depth, (var, values, position) in enumerate(self.frames):
+            if position < len(values):
+                start = max(position, len(values) - wanted)
+                key, assignment = self.path(depth)
+                tasks = [(key + (rank,), assignment + [(var.id, values[rank])]) for rank in range(start, len(values))]
+                del values[start:]
+                self.share(tasks)
+                return
+
+    def search(self, assignment):
+        if self.budget is not None:
+            self.spend(assignment)
+        if len(assignment)==len(self.crossword_creator.crossword.variables):
+            return assignment
+        var=self.select_unassigned_variable(assignment)
+        self.expanded(var, assignment)
+        frame=[var, list(self.order_domain_values(var,assignment)), 0]
+        self.frames.append(frame)
+        try:
+            while frame[2] < len(frame[1]):
+                value=frame[1][frame[2]]
+                frame[2]+=1
+                self.nodes+=1
+                self.stats.nodes_generated+=1
+                if self.hungry is not None and self.nodes % self.check_interval == 0:
+                    self.give_away()
+                mark=self.trail.mark()
+                if self.assign(var, value, assignment):
+                    result=self.search(assignment)
+                    if result is not None:
+                        return result
+                self.unassign(var, assignment, mark)
+            return None
+        finally:
+            self.frames.pop()
+
+
+def split(csp, tasks, target, max_depth):
+    """
+    Cut the search tree breadth first until there are `target` tasks (or `max_depth` levels),
+    children keep the order of their parents so the tasks stay sorted by key.
+    Subtrees whose prefix is already inconsistent are dropped, complete assignments are kept as tasks.
+    """
+    variables = csp.crossword_creator.crossword.variable_list
+    for _ in range(max_depth):
+        if len(tasks) >= target:
+            break
+        children = []
+        for key, prefix in tasks:
+            mark = csp.trail.mark()
+            assignment = dict()
+            try:
+                if not all(csp.assign(variables[var_id], word, assignment) for var_id, word in prefix):
+                    continue
+                if len(assignment) == len(variables):
+                    children.append((key, prefix))
+                    continue
+                csp.start_ordering(assignment)
+                var = csp.select_unassigned_variable(assignment)
+                for rank, value in enumerate(csp.order_domain_values(var, assignment)):
+                    children.append((key + (rank,), prefix + [(var.id, value)]))
+            finally:
+                csp.trail.undo(mark)
+        if children == tasks:
+            break
+        tasks = children
+    return tasks
+
+
+def run_worker(crossword, domains, inference, tasks, messages, waiting):
+    """
+    Worker process: solve the tasks taken from `tasks` until it is terminated (or gets None),
+    `waiting` is the shared number of workers waiting for a task.
+    Messages sent to the coordinator are ("split", tasks given away), ("done", key, solution)
+    and ("error", key, message) if solving the task raised.
+    """
+    creator = CrosswordCreator(crossword)
+    creator.restore({var: domains[var.id] for var in crossword.variable_list})
+
+    def hungry():
+        return waiting.value
+
+    def share(subtasks):
+        messages.put(("split", subtasks))
+
+    csp = SplittingCSP(creator, inference, hungry, share)
+    while True:
+        with waiting.get_lock():
+            waiting.value += 1
+        task = tasks.get()
+        with waiting.get_lock():
+            waiting.value -= 1
+        if task is None:
+            return
+        key, assignment = task
+        try:
+            solution = csp.solve_task(key, assignment)
+        except Exception as error:
+            messages.put(("error", key, repr(error)))
+            return
+        if solution is not None:
+            solution = {var.id: word for var, word in solution.items()}
+        messages.put(("done", key, solution))
+
+
+def solve_parallel(crossword, workers=None, inference=CSP.MAC, split_factor=4, max_split_depth=3, context=None):
+    """
+    Solve `crossword` with the CSP search split over `workers` processes (the number of cpus by default).
+    Return the solution that the sequential search would return, or None if there is none:
+    a solution is only returned once every subtree coming before it (in the order of the
+    sequential search) is known to have none, so the answer doesn't depend on the timing.
+    Raise RuntimeError if a worker fails.
+    """
+    creator = CrosswordCreator(crossword)
+    csp = CSP(creator, inference)
+    if FeasibilityAnalyzer(creator, csp.arc_consistency).analyze() is not None:
+        return None
+    workers = workers or multiprocessing.cpu_count()
+    open_tasks = split(csp, [((), [])], workers * split_factor, max_split_depth)
+    if not open_tasks:
+        return None
+    domains = [creator.domains[var].bits for var in crossword.variable_list]
+
+    context = context or multiprocessing.get_context()
+    tasks = context.Queue()
+    messages = context.Queue()
+    waiting = context.Value("i", 0)
+    processes = [
+        context.Process(target=run_worker, args=(crossword, domains, inference, tasks, messages, waiting), daemon=True)
+        for _ in range(workers)
+    ]
+    for process in processes:
+        process.start()
+    for task in open_tasks:
+        tasks.put(task)
+    open_keys = {key for key, _ in open_tasks}
+    best = None     # (key, solution) of the first solution in search order found so far
+    try:
+        while open_keys:
+            if best is not None and min(open_keys) > best[0]:
+                break
+            try:
+                message = messages.get(timeout=1)
+            except queue.Empty:
+                if any(process.exitcode is not None for process in processes):
+                    raise RuntimeError("a worker process died before the search was over")
+                continue
+            if message[0] == "error":
+                raise RuntimeError(f"solving the subtree {message[1]} failed: {message[2]}")
+            if message[0] == "split":
+                for task in message[1]:
+                    open_keys.add(task[0])
+                    tasks.put(task)
+            else:
+                _, key, solution = message
+                open_keys.discard(key)
+                if solution is not None and (best is None or key < best[0]):
+                    best = (key, solution)
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.join()
+        tasks.close()
+        messages.close()
+    if best is None:
+        return None
+    return {crossword.variable_list[var_id]: word for var_id, word in best[1].items()}
+
+
+def main():
+
+    # Check usage
+    if len(sys.argv) not in [3, 4, 5]:
+        sys.exit("Usage: python parallel_csp.py structure words [output] [workers]")
+
+    # Parse command-line arguments
+    structure = sys.argv[1]
+    words = sys.argv[2]
+    output = sys.argv[3] if len(sys.argv) >= 4 else None
+    workers = int(sys.argv[4]) if len(sys.argv) == 5 else None
+
+    # Generate crossword
+    crossword = Crossword(structure, words)
+    creator = CrosswordCreator(crossword)
+    start = timeit.default_timer()
+    assignment = solve_parallel(crossword, workers)
+    stop = timeit.default_timer()
+    print('Time Taken to solve the problem: ', stop - start)
+
+    # Print result
+    if assignment is None:
+        print("No solution.")
+    else:
+        creator.print(assignment)
+        if output:
+            creator.save(assignment, output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+"""
+This File demonstrates solving the crossword problem with a portfolio: several configurations of
+the CSP and the A* solvers race in separate processes and the first one to finish wins.
+"""
+
+import sys
+import multiprocessing
+import queue
+import timeit
+
+from crossword import *
+from crossword_creator import *
+from CSP import CSP
+from general_search import general_search
+
+
+class Configuration():
+
+    CSP_SOLVER = "csp"
+    SEARCH_SOLVER = "search"
+
+    def __init__(self, solver, inference=CSP.MAC, seed=None, backjumping=False, ordering=CSP.MRV, restarts=None,
+                 strategy=general_search.ASTAR, beam_width=100, epsilon=2.0):
+        """
+        A way of solving the crossword: `solver` is Configuration.CSP_SOLVER (with its `inference`,
+        the `seed` breaking the ordering ties, `backjumping`, variable `ordering` and `restarts`) or Configuration.SEARCH_SOLVER (with its `strategy`,
+        `beam_width` and `epsilon`, see `general_search.solve`).
+        """
+        self.solver = solver
+        self.inference = inference
+        self.seed = seed
+        self.backjumping = backjumping
+        self.ordering = ordering
+        self.restarts = restarts
+        self.strategy = strategy
+        self.beam_width = beam_width
+        self.epsilon = epsilon
+
+    @property
+    def complete(self):
+        """Check if "no solution" from this configuration proves that the crossword has none."""
+        return self.solver == Configuration.CSP_SOLVER or self.strategy != general_search.BEAM
+
+    def solve(self, crossword, excluded=()):
+        """Solve `crossword` with this configuration without using the words `excluded`, return the assignment or None."""
+        creator = CrosswordCreator(crossword)
+        creator.exclude(excluded)
+        if self.solver == Configuration.CSP_SOLVER:
+            return CSP(creator, self.inference, self.seed, self.backjumping,
+                       ordering=self.ordering, restarts=self.restarts).solve()
+        if self.solver == Configuration.SEARCH_SOLVER:
+            search_problem = general_search(creator)
+            return search_problem.solve(search_problem.initial_state, self.strategy, self.beam_width, self.epsilon)
+        raise ValueError(f"unknown solver {self.solver!r}")
+
+    def __repr__(self):
+        if self.solver == Configuration.CSP_SOLVER:
+            return (f"Configuration({self.solver!r}, inference={self.inference!r}, seed={self.seed!r}, "
+                    f"backjumping={self.backjumping!r}, ordering={self.ordering!r}, restarts={self.restarts!r})")
+        return f"Configuration({self.solver!r}, strategy={self.strategy!r})"
+
+
+DEFAULT_PORTFOLIO = (
+    Configuration(Configuration.CSP_SOLVER, CSP.MAC),
+    Configuration(Configuration.CSP_SOLVER, CSP.FORWARD_CHECKING),
+    Configuration(Configuration.CSP_SOLVER, CSP.MAC, seed=1),
+    Configuration(Configuration.CSP_SOLVER, CSP.MAC, backjumping=True),
+    Configuration(Configuration.CSP_SOLVER, CSP.MAC, seed=2, ordering=CSP.DOM_WDEG, restarts=CSP.LUBY),
+    Configuration(Configuration.SEARCH_SOLVER, strategy=general_search.ASTAR),
+    Configuration(Configuration.SEARCH_SOLVER, strategy=general_search.DEPTH_FIRST),
+    Configuration(Configuration.SEARCH_SOLVER, strategy=general_search.BEAM),
+)
+
+
+class PortfolioResult():
+
+    SOLVED = "solved"
+    UNSATISFIABLE = "unsatisfiable"
+    TIMEOUT = "timeout"     # the budget ran out (or every configuration gave up) without an answer
+    ERROR = "error"         # every configuration failed with an exception
+
+    def __init__(self, status, assignment=None, configuration=None, elapsed=0.0, errors=()):
+        """
+        Outcome of a portfolio run, `configuration` is the one that gave the answer
+        and `errors` the (configuration, message) of the workers that raised.
+        """
+        self.status = status
+        self.assignment = assignment
+        self.configuration = configuration
+        self.elapsed = elapsed
+        self.errors = list(errors)
+
+    def __repr__(self):
+        return f"PortfolioResult({self.status!r}, configuration={self.configuration!r}, elapsed={self.elapsed:.3f})"
+
+
+def run_configuration(crossword, position, configuration, results):
+    """
+    Worker process: solve with one configuration and put (position, kind, payload) in `results`,
+    the assignment is sent as a mapping from variable ids to words to keep it small.
+    """
+    try:
+        assignment = configuration.solve(crossword)
+    except Exception as error:
+        results.put((position, "error", repr(error)))
+        return
+    if assignment is None:
+        results.put((position, "none", None))
+    else:
+        results.put((position, "solution", {var.id: word for var, word in assignment.items()}))
+
+
+def solve_portfolio(crossword, configurations=DEFAULT_PORTFOLIO, budget=None, context=None):
+    """
+    Race `configurations` on `crossword`, one process each, and return a `PortfolioResult`.
+    The first solution wins, so does a "no solution" from a complete configuration.
+    `budget` is the wall-clock limit in seconds (None waits for an answer),
+    the remaining workers are terminated as soon as the result is known.
+    """
+    start = timeit.default_timer()
+    context = context or multiprocessing.get_context()
+    results = context.Queue()
+    workers = [
+        context.Process(target=run_configuration, args=(crossword, position, configuration, results), daemon=True)
+        for position, configuration in enumerate(configurations)
+    ]
+    for worker in workers:
+        worker.start()
+    errors = []
+    pending = len(workers)
+    try:
+        while pending:
+            timeout = None
+            if budget is not None:
+                timeout = budget - (timeit.default_timer() - start)
+                if timeout <= 0:
+                    break
+            try:
+                position, kind, payload = results.get(timeout=timeout)
+            except queue.Empty:
+                break
+            pending -= 1
+            configuration = configurations[position]
+            elapsed = timeit.default_timer() - start
+            if kind == "solution":
+                assignment = {crossword.variable_list[var_id]: word for var_id, word in payload.items()}
+                return PortfolioResult(PortfolioResult.SOLVED, assignment, configuration, elapsed, errors)
+            if kind == "none" and configuration.complete:
+                return PortfolioResult(PortfolioResult.UNSATISFIABLE, None, configuration, elapsed, errors)
+            if kind == "error":
+                errors.append((configuration, payload))
+        status = PortfolioResult.ERROR if errors and len(errors) == len(workers) else PortfolioResult.TIMEOUT
+        return PortfolioResult(status, elapsed=timeit.default_timer() - start, errors=errors)
+    finally:
+        for worker in workers:
+            if worker.is_alive():
+                worker.terminate()
+        for worker in workers:
+            worker.join()
+        results.close()
+
+
+def main():
+
+    # Check usage
+    if len(sys.argv) not in [3, 4, 5]:
+        sys.exit("Usage: python portfolio.py structure words [output] [budget]")
+
+    # Parse command-line arguments
+    structure = sys.argv[1]
+    words = sys.argv[2]
+    output = sys.argv[3] if len(sys.argv) >= 4 else None
+    budget = float(sys.argv[4]) if len(sys.argv) == 5 else None
+
+    # Generate crossword
+    crossword = Crossword(structure, words)
+    creator = CrosswordCreator(crossword)
+    result = solve_portfolio(crossword, budget=budget)
+    print('Time Taken to solve the problem: ', result.elapsed)
+    print('Winning configuration: ', result.configuration)
+
+    # Print result
+    if result.assignment is None:
+        print("No solution." if result.status != PortfolioResult.TIMEOUT else "No solution within the budget.")
+    else:
+        creator.print(result.assignment)
+        if output:
+            creator.save(result.assignment, output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+"""
+This File contains the solution cache of the solvers: a solve is identified by the content hash of the
+parsed structure, of the vocabulary and of the solver options, and its answer (the words of the variables,
+or no solution) is kept in a bounded in-memory LRU and in a directory of small JSON files bounded in size,
+so that solving the same puzzle again, in this process or a later one, costs a lookup.
+"""
+
+import hashlib
+import json
+import os
+import tempfile
+from collections import OrderedDict
+
+from compiled_dictionary import default_cache_dir
+
+
+# changes when the meaning of the entries does, older entries are then never looked up again
+FORMAT = 1
+
+# what `get` returns for a key that isn't cached, an entry of no solution is None
+MISS = object()
+
+
+class SolutionCache():
+
+    def __init__(self, directory=None, memory_size=1024, disk_size=64 << 20):
+        """
+        Cache of the answers of the solvers, at most `memory_size` entries are kept in memory
+        (least recently used are evicted) and the files of `directory` (none without one) take
+        at most about `disk_size` bytes: once over, the least recently used are removed down to 90%.
+        The disk is best effort, an entry that can't be read or written is a miss.
+        """
+        self.directory = directory
+        self.memory_size = memory_size
+        self.disk_size = disk_size
+        self.memory = OrderedDict()     # key -> list of the words by variable id, or None (no solution)
+        self.disk_usage = None          # bytes of the entries on disk, counted at the first write
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def key(crossword, solver, options):
+        """
+        Return the key (hex sha256) of solving `crossword` with `solver` (a name) and its `options`
+        (a JSON serializable dict), only the parsed structure and the vocabulary of the crossword count.
+        """
+        content = json.dumps([FORMAT, crossword.fingerprint(), crossword.index.fingerprint(), solver, options],
+                             sort_keys=True)
+        return hashlib.sha256(content.encode()).hexdigest()
+
+    def path(self, key):
+        return os.path.join(self.directory, key[:2], key + ".json")
+
+    def get(self, key):
+        """Return the words of the variables (by id) cached for `key`, None if it has no solution or MISS."""
+        if key in self.memory:
+            self.memory.move_to_end(key)
+            self.hits += 1
+            return self.memory[key]
+        words = self.read(key)
+        if words is MISS:
+            self.misses += 1
+            return MISS
+        self.hits += 1
+        self.remember(key, words)
+        return words
+
+    def put(self, key, words):
+        """Cache the words of the variables (by id) for `key`, None records that there is no solution."""
+        self.remember(key, words)
+        self.write(key, words)
+
+    def lookup(self, key, crossword):
+        """
+        Return the assignment (variable -> word) cached for `key` of `crossword`, None if it has no solution
+        or MISS, an entry that doesn't fit the variables of `crossword` is a miss.
+        """
+        words = self.get(key)
+        if words is MISS or words is None:
+            return words
+        variables = crossword.variable_list
+        if len(words) != len(variables) or any(len(word) != var.length for var, word in zip(variables, words)):
+            return MISS
+        return dict(zip(variables, words))
+
+    def store(self, key, crossword, assignment):
+        """Cache the `assignment` of `crossword` (None if there is no solution) for `key`."""
+        if assignment is None:
+            self.put(key, None)
+        else:
+            self.put(key, [assignment[var] for var in crossword.variable_list])
+
+    def remember(self, key, words):
+        self.memory[key] = words
+        self.memory.move_to_end(key)
+        if len(self.memory) > self.memory_size:
+            self.memory.popitem(last=False)
+
+    def read(self, key):
+        if self.directory is None:
+            return MISS
+        path = self.path(key)
+        try:
+            with open(path) as f:
+                entry = json.load(f)
+            os.utime(path)  # the modification time orders the eviction
+        except (OSError, ValueError):
+            return MISS
+        if not isinstance(entry, dict) or "words" not in entry:
+            return MISS
+        return entry["words"]
+
+    def write(self, key, words):
+        if self.directory is None:
+            return
+        path = self.path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            try:
+                replaced = os.path.getsize(path)
+            except OSError:
+                replaced = 0
+            handle, temporary = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+            with os.fdopen(handle, "w") as f:
+                json.dump({"words": words}, f)
+            os.replace(temporary, path)
+            if self.disk_usage is None:
+                self.disk_usage = sum(size for _, size, _ in self.entries())
+            else:
+                self.disk_usage += os.path.getsize(path) - replaced
+            if self.disk_usage > self.disk_size:
+                self.evict()
+        except OSError:
+            pass    # the entry is only computed again next time
+
+    def entries(self):
+        """Return the (path, size, modification time) of the entries on disk."""
+        entries = []
+        for directory in os.scandir(self.directory):
+            if not directory.is_dir():
+                continue
+            for entry in os.scandir(directory.path):
+                if entry.name.endswith(".json"):
+                    try:
+                        stat = entry.stat()
+                    except OSError:
+                        continue    # removed by another process
+                    entries.append((entry.path, stat.st_size, stat.st_mtime_ns))
+        return entries
+
+    def evict(self):
+        """Remove the least recently used entries from the disk until they take 90% of `disk_size`."""
+        entries = sorted(self.entries(), key=lambda entry: entry[2])
+        usage = sum(size for _, size, _ in entries)
+        for path, size, _ in entries:
+            if usage <= self.disk_size * 0.9:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            usage -= size
+        self.disk_usage = usage
+
+
+def default_cache():
+    """The solution cache of the command line tools, in the "solutions" directory of $CROSSWORD_CACHE or ~/.cache/crossword."""
+    return SolutionCache(os.path.join(default_cache_dir(), "solutions"))
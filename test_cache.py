@@ -0,0 +1,134 @@
+"""
+This File contains the regression checks of the solution cache and of the compiled dictionaries,
+run with `python -m unittest test_cache`.
+"""
+
+import os
+import tempfile
+import unittest
+
+from compiled_dictionary import load_compiled
+from crossword import *
+from crossword_creator import *
+from CSP import CSP
+from solution_cache import MISS, SolutionCache
+
+
+DATA = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+
+
+class SolutionCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.crossword = Crossword(os.path.join(DATA, "structure1.txt"), os.path.join(DATA, "words1.txt"))
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_solution_is_found_again(self):
+        problem = CSP(CrosswordCreator(self.crossword), cache=SolutionCache(self.directory.name))
+        key = problem.cache_key()
+        assignment = problem.solve()
+        self.assertFalse(problem.cached)
+        # a new cache reads the entry back from the disk
+        cache = SolutionCache(self.directory.name)
+        self.assertEqual(cache.lookup(key, self.crossword), assignment)
+        self.assertEqual(cache.hits, 1)
+        problem = CSP(CrosswordCreator(self.crossword), cache=cache)
+        self.assertEqual(problem.solve(), assignment)
+        self.assertTrue(problem.cached)
+        self.assertFalse(problem.crossword_creator.has_domains())
+
+    def test_no_solution_is_cached(self):
+        cache = SolutionCache(self.directory.name)
+        cache.store("0" * 64, self.crossword, None)
+        self.assertIsNone(SolutionCache(self.directory.name).lookup("0" * 64, self.crossword))
+        self.assertIs(cache.lookup("1" * 64, self.crossword), MISS)
+        self.assertEqual(cache.misses, 1)
+
+    def test_entry_of_other_variables_is_a_miss(self):
+        cache = SolutionCache()
+        cache.put("0" * 64, ["TOO", "FEW"])
+        self.assertIs(cache.lookup("0" * 64, self.crossword), MISS)
+
+    def test_least_recently_used_is_evicted_from_memory(self):
+        cache = SolutionCache(memory_size=2)
+        cache.put("a", ["A"])
+        cache.put("b", ["B"])
+        cache.get("a")
+        cache.put("c", ["C"])
+        self.assertIs(cache.get("b"), MISS)
+        self.assertEqual(cache.get("a"), ["A"])
+        self.assertEqual(cache.get("c"), ["C"])
+
+    def test_least_recently_used_is_evicted_from_disk(self):
+        keys = [str(k) * 64 for k in range(4)]
+        cache = SolutionCache(self.directory.name)
+        for time, key in enumerate(keys[:3], 1):
+            cache.put(key, ["ABC"])
+            os.utime(cache.path(key), ns=(time * 10 ** 9, time * 10 ** 9))
+        size = os.path.getsize(cache.path(keys[0]))
+        # a fourth entry goes over the size, the oldest entry is removed to get under 90% of it
+        cache = SolutionCache(self.directory.name, disk_size=int(size * 3.5))
+        cache.put(keys[3], ["ABC"])
+        self.assertFalse(os.path.exists(cache.path(keys[0])))
+        self.assertTrue(all(os.path.exists(cache.path(key)) for key in keys[1:]))
+        self.assertEqual(cache.disk_usage, size * 3)
+
+
+class CompiledDictionaryTest(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.cache_dir = os.path.join(self.directory.name, "cache")
+        self.words_file = os.path.join(self.directory.name, "words.txt")
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def write_words(self, words):
+        with open(self.words_file, "w") as f:
+            f.write("\n".join(words) + "\n")
+
+    def compiled_files(self):
+        return [name for name in os.listdir(self.cache_dir) if name.endswith(".cwdict")]
+
+    def assertSameIndex(self, compiled, index):
+        self.assertEqual(compiled.words, index.words)
+        for length in range(1, 8):
+            self.assertEqual(compiled.words_of_length(length), index.words_of_length(length))
+            self.assertEqual(compiled.full_mask(length), index.full_mask(length))
+            for position in range(length):
+                for letter in index.letters_at(length, position):
+                    self.assertEqual(compiled.mask_with(length, position, letter),
+                                     index.mask_with(length, position, letter))
+
+    def test_round_trip(self):
+        words = ["one", "two", "three", "four", "five", "six", "seven"]
+        self.write_words(words)
+        compiled = load_compiled(self.words_file, self.cache_dir)
+        self.assertSameIndex(compiled, WordIndex(word.upper() for word in words))
+        self.assertEqual(len(self.compiled_files()), 1)
+        # loaded from the cache the second time
+        self.assertSameIndex(load_compiled(self.words_file, self.cache_dir), WordIndex(word.upper() for word in words))
+
+    def test_rebuilt_when_the_words_file_changes(self):
+        self.write_words(["one", "two"])
+        load_compiled(self.words_file, self.cache_dir)
+        self.write_words(["three", "four", "five"])
+        compiled = load_compiled(self.words_file, self.cache_dir)
+        self.assertEqual(compiled.words, {"THREE", "FOUR", "FIVE"})
+        # the file of the previous content is removed
+        self.assertEqual(len(self.compiled_files()), 1)
+
+    def test_truncated_file_is_compiled_again(self):
+        self.write_words(["one", "two", "three"])
+        load_compiled(self.words_file, self.cache_dir)
+        path = os.path.join(self.cache_dir, self.compiled_files()[0])
+        os.truncate(path, os.path.getsize(path) // 2)
+        self.assertEqual(load_compiled(self.words_file, self.cache_dir).words, {"ONE", "TWO", "THREE"})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,167 @@
+"""
+This File contains the regression checks of the CSP solver, of its propagators and of the feasibility analysis,
+run with `python -m unittest test_csp`.
+"""
+
+import os
+import unittest
+
+from crossword import *
+from crossword_creator import *
+from CSP import CSP
+from benchmark import generate_structure, generate_dictionary
+from feasibility import FeasibilityAnalyzer, Infeasibility
+from incremental import IncrementalSolver
+from matching import filter_all_different
+
+
+DATA = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+
+# generated (size, density, dictionary size, seed) puzzles that the search has to backtrack on,
+# the first two have solutions and the others don't
+PUZZLES = [(5, 0.3, 1000, 0), (5, 0.4, 1000, 0), (6, 0.3, 1000, 0), (6, 0.4, 1000, 0)]
+
+
+def generated(size, density, dictionary, seed):
+    """Return the lines of the structure and the words of a generated puzzle."""
+    return generate_structure(size, size, density, seed), generate_dictionary(dictionary, seed, size)
+
+
+class SolutionTestCase(unittest.TestCase):
+
+    def assertSolves(self, crossword, assignment):
+        """Check that `assignment` fills every slot with distinct words of the vocabulary agreeing on the crossings."""
+        variables = crossword.variable_list
+        self.assertEqual(set(assignment), set(variables))
+        self.assertEqual(len(set(assignment.values())), len(variables))
+        for var in variables:
+            self.assertIn(assignment[var], crossword.index.words_of_length(var.length))
+            for other_id, i, j in crossword.adjacency[var.id]:
+                self.assertEqual(assignment[var][i], assignment[variables[other_id]][j])
+
+
+class PrefixTest(unittest.TestCase):
+
+    def setUp(self):
+        self.crossword = Crossword(os.path.join(DATA, "structure0.txt"), os.path.join(DATA, "words0.txt"))
+
+    def test_inconsistent_prefix_is_rejected(self):
+        # ONE and SEVEN start at the same cell, O != S
+        variables = self.crossword.variable_list
+        prefix = {variables[0]: "ONE", variables[1]: "SEVEN"}
+        for inference in (None, CSP.FORWARD_CHECKING, CSP.MAC):
+            problem = CSP(CrosswordCreator(self.crossword), inference)
+            self.assertIsNone(problem.backtrack(dict(prefix)), inference)
+
+    def test_consistent_prefix_is_extended(self):
+        variables = self.crossword.variable_list
+        problem = CSP(CrosswordCreator(self.crossword))
+        assignment = problem.backtrack({variables[0]: "SIX"})
+        self.assertEqual(assignment[variables[0]], "SIX")
+        self.assertEqual(assignment[variables[1]], "SEVEN")
+
+
+class AllDifferentTest(unittest.TestCase):
+
+    def test_hall_set_words_are_removed_from_the_others(self):
+        # the first two variables can only take words 0 and 1 between them, the third is left with word 2
+        filtered, match = filter_all_different([0b011, 0b011, 0b111])
+        self.assertEqual(filtered, [0b011, 0b011, 0b100])
+        self.assertEqual(sorted(match), [0, 1, 2])
+
+    def test_words_of_some_maximum_matching_are_kept(self):
+        filtered, _ = filter_all_different([0b011, 0b110, 0b101])
+        self.assertEqual(filtered, [0b011, 0b110, 0b101])
+
+    def test_hall_violator_is_reported(self):
+        filtered, violator = filter_all_different([0b001, 0b001, 0b110])
+        self.assertIsNone(filtered)
+        self.assertEqual(set(violator), {0, 1})
+
+
+class BackjumpingTest(SolutionTestCase):
+
+    def test_backjumping_agrees_with_backtracking(self):
+        for puzzle in PUZZLES:
+            lines, words = generated(*puzzle)
+            index = WordIndex(words)
+            expected = CSP(CrosswordCreator(Crossword.from_lines(lines, index)), CSP.FORWARD_CHECKING).solve()
+            for inference in (CSP.FORWARD_CHECKING, CSP.MAC):
+                for nogoods in (0, 10000):
+                    crossword = Crossword.from_lines(lines, index)
+                    problem = CSP(CrosswordCreator(crossword), inference, backjumping=True, nogoods=nogoods)
+                    assignment = problem.solve()
+                    self.assertEqual(assignment is None, expected is None, (puzzle, inference, nogoods))
+                    if assignment is not None:
+                        self.assertSolves(crossword, assignment)
+
+    def test_backjumping_needs_propagation(self):
+        crossword = Crossword(os.path.join(DATA, "structure0.txt"), os.path.join(DATA, "words0.txt"))
+        with self.assertRaises(ValueError):
+            CSP(CrosswordCreator(crossword), None, backjumping=True)
+
+
+class IncrementalTest(SolutionTestCase):
+
+    def assertSameAsFresh(self, solver, words):
+        """Check that the last solve of `solver` agrees with solving its current puzzle from scratch."""
+        crossword = Crossword.from_lines(solver.lines(), WordIndex(words))
+        expected = CSP(CrosswordCreator(crossword)).solve()
+        self.assertEqual(solver.solution is None, expected is None, solver.lines())
+        if solver.solution is not None:
+            self.assertSolves(solver.crossword, solver.solution)
+
+    def test_edits_agree_with_a_fresh_solve(self):
+        lines, words = generated(*PUZZLES[0])
+        words = set(words)
+        solver = IncrementalSolver(lines, words)
+        solver.solve()
+        self.assertSameAsFresh(solver, words)
+        for i, j in [(0, 0), (2, 2), (4, 1), (2, 2)]:
+            solver.toggle(i, j)
+            solver.solve()
+            self.assertSameAsFresh(solver, words)
+        if solver.solution is not None:
+            used = set(list(solver.solution.values())[:2])
+            solver.remove_words(used)
+            words -= used
+            solver.solve()
+            self.assertSameAsFresh(solver, words)
+            solver.add_words(used)
+            words |= used
+            solver.solve()
+            self.assertSameAsFresh(solver, words)
+
+
+class FeasibilityTest(unittest.TestCase):
+
+    def analyze(self, lines, words):
+        return FeasibilityAnalyzer(CrosswordCreator(Crossword.from_lines(lines, WordIndex(words)))).analyze()
+
+    def test_too_few_words_of_a_length(self):
+        reason = self.analyze(["___", "###", "___"], ["ABC", "ABCD"])
+        self.assertEqual(reason.kind, Infeasibility.LENGTH_COUNT)
+        self.assertEqual(len(reason.variables), 2)
+
+    def test_no_letter_fits_a_crossing(self):
+        reason = self.analyze(["___", "_##"], ["ABC", "XY"])
+        self.assertEqual(reason.kind, Infeasibility.CROSSING)
+        self.assertEqual(reason.cell, (0, 0))
+
+    def test_arc_consistency_empties_a_domain(self):
+        # every crossing has a letter, but the across word fitting the left down word leaves none for the right one
+        reason = self.analyze(["___", "_#_"], ["ABC", "XBZ", "AQ", "ZR"])
+        self.assertEqual(reason.kind, Infeasibility.EMPTY_DOMAIN)
+
+    def test_same_length_variables_share_too_few_words(self):
+        # both down words have to start with A and only AB does
+        reason = self.analyze(["___", "_#_"], ["ABA", "AB", "CD"])
+        self.assertEqual(reason.kind, Infeasibility.ALL_DIFFERENT)
+        self.assertEqual(len(reason.variables), 2)
+
+    def test_feasible_puzzle_is_accepted(self):
+        self.assertIsNone(self.analyze(["___", "_#_"], ["ABA", "AB", "AC"]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,44 +1,283 @@
 
 import heapq
+import itertools
+import json
+import time
 
 class Node():
+
+    __slots__ = ("state", "cost", "seq")
+
+    # nodes are numbered in creation order, the number breaks ties between equal priorities
+    sequence = itertools.count()
+
     def __init__(self, state,cost):
         self.state = state
         self.cost=cost
+        self.seq=next(Node.sequence)
 
     def __lt__(self, other):
-        return self
+        return (self.cost, self.seq) < (other.cost, other.seq)
 
     def __le__(self,other):
-        return self
+        return (self.cost, self.seq) <= (other.cost, other.seq)
 
     def __gt__(self, other):
-        return self
+        return (self.cost, self.seq) > (other.cost, other.seq)
     
     def __ge__(self, other):
-        return self 
+        return (self.cost, self.seq) >= (other.cost, other.seq)
 
     def __print__(self):
         print(self.state,self.cost)
-        
+
+
+class SearchStats():
+    """
+    Counters of a search shared by both solvers, they are plain integer increments at node
+    granularity so keeping them costs next to nothing:
+    nodes expanded (CSP: search calls, A*: nodes whose actions were computed), nodes generated
+    (CSP: values tried, A*: successors), backtracks (assignments undone), revise calls and prunes
+    of the arc consistency engine, get_actions calls, heuristic evaluations and cache hits, nogoods
+    learned and used, restarts and the largest number of nodes held in the frontier at once.
+    `phases` maps the name of a phase to its wall-clock duration in seconds.
+    """
+
+    __slots__ = ("nodes_expanded", "nodes_generated", "backtracks", "revisions", "prunes", "actions",
+                 "heuristic_evaluations", "heuristic_hits", "nogoods_learned", "nogood_hits", "restarts",
+                 "peak_frontier", "phases")
+
+    def __init__(self):
+        for name in self.__slots__:
+            setattr(self, name, 0)
+        self.phases = dict()
+
+    def frontier(self, size):
+        if size > self.peak_frontier:
+            self.peak_frontier = size
+
+    def phase(self, name):
+        """Context manager adding the time spent in its block to the phase `name`."""
+        return PhaseTimer(self.phases, name)
+
+    def as_dict(self):
+        result = {name: getattr(self, name) for name in self.__slots__}
+        result["phases"] = dict(self.phases)
+        return result
+
+    def __repr__(self):
+        return f"SearchStats({self.as_dict()})"
+
+
+class PhaseTimer():
+
+    __slots__ = ("phases", "name", "start")
+
+    def __init__(self, phases, name):
+        self.phases = phases
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc):
+        self.phases[self.name] = self.phases.get(self.name, 0.0) + time.perf_counter() - self.start
+        return False
+
+
+class Tracer():
+    """
+    Sampling hook dumping a compact trace of a search: every `every`-th event is written to
+    `stream` as a JSON line {"e": event, "n": event number, "t": seconds since start, ...fields}.
+    Solvers only call it when one is set, so tracing costs nothing when it is off.
+    """
+
+    def __init__(self, stream, every=1000):
+        self.stream = stream
+        self.every = every
+        self.count = 0
+        self.start = time.perf_counter()
+
+    def sample(self, event, **fields):
+        self.count += 1
+        if self.count % self.every == 0:
+            fields["e"] = event
+            fields["n"] = self.count
+            fields["t"] = round(time.perf_counter() - self.start, 6)
+            self.stream.write(json.dumps(fields) + "\n")
+
+
+class CancellationToken():
+    """
+    Flag shared with a running search, `cancel` can be called from another thread
+    and the search checks `cancelled` (a plain attribute, cheap to read) at every node.
+    """
+
+    __slots__ = ("cancelled",)
+
+    def __init__(self):
+        self.cancelled = False
+
+    def cancel(self):
+        self.cancelled = True
+
+
+class BudgetExceeded(Exception):
+    """Raised by `Budget.spend` to stop a search, `reason` is the AnytimeResult status."""
+
+    def __init__(self, reason):
+        super().__init__(reason)
+        self.reason = reason
+
+
+class Budget():
+    """
+    Limits of a search: `time_limit` seconds from now, `node_limit` nodes and a CancellationToken.
+    The search calls `spend` at every node, it raises BudgetExceeded once a limit is reached.
+    """
+
+    __slots__ = ("deadline", "node_limit", "token", "nodes", "start")
+
+    def __init__(self, time_limit=None, node_limit=None, token=None):
+        self.start = time.monotonic()
+        self.deadline = None if time_limit is None else self.start + time_limit
+        self.node_limit = node_limit
+        self.token = token
+        self.nodes = 0
+
+    def spend(self):
+        """Count a node and check the limits."""
+        self.nodes += 1
+        if self.node_limit is not None and self.nodes > self.node_limit:
+            raise BudgetExceeded(AnytimeResult.NODE_LIMIT)
+        self.check()
+
+    def check(self):
+        """Check the deadline and the token only, for the work done between two nodes."""
+        if self.token is not None and self.token.cancelled:
+            raise BudgetExceeded(AnytimeResult.CANCELLED)
+        if self.deadline is not None and time.monotonic() > self.deadline:
+            raise BudgetExceeded(AnytimeResult.DEADLINE)
+
+    def elapsed(self):
+        return time.monotonic() - self.start
+
+
+class AnytimeResult():
+    """
+    Outcome of a search run with a budget: the solution (status SOLVED), no solution (NO_SOLUTION)
+    or the best partial assignment found before the budget ran out, with the search statistics.
+    """
+
+    SOLVED = "solved"
+    NO_SOLUTION = "no_solution"
+    DEADLINE = "deadline"
+    NODE_LIMIT = "node_limit"
+    CANCELLED = "cancelled"
+
+    def __init__(self, status, assignment, stats):
+        self.status = status
+        self.assignment = assignment
+        self.stats = stats
+
+    @property
+    def complete(self):
+        return self.status == AnytimeResult.SOLVED
+
+    def __repr__(self):
+        size = 0 if self.assignment is None else len(self.assignment)
+        return f"AnytimeResult({self.status!r}, assigned={size}, stats={self.stats})"
+
+
+class SearchState():
+    """
+    Immutable search state: the index of the word assigned to each variable (in the bucket of
+    the variable's length) or None, stored by variable id in chunks of CHUNK entries so that a
+    child shares all the chunks of its parent but the one it changes.
+    `used` maps a length to the bitmask of the words of that length already assigned and the hash
+    is maintained incrementally (Zobrist style) from the (variable id, word index) pairs.
+    """
+
+    __slots__ = ("chunks", "used", "assigned", "hash_value")
+
+    CHUNK = 32
+
+    def __init__(self, chunks, used, assigned, hash_value):
+        self.chunks = chunks
+        self.used = used
+        self.assigned = assigned
+        self.hash_value = hash_value
+
+    @classmethod
+    def empty(cls, size):
+        chunk = (None,) * cls.CHUNK
+        return cls((chunk,) * ((size + cls.CHUNK - 1) // cls.CHUNK), dict(), 0, 0)
+
+    def word(self, var_id):
+        """Return the index of the word assigned to variable `var_id`, or None."""
+        return self.chunks[var_id // SearchState.CHUNK][var_id % SearchState.CHUNK]
+
+    def assign(self, var_id, word, length):
+        """Return the child state where variable `var_id` (of length `length`) is assigned word index `word`."""
+        c, offset = divmod(var_id, SearchState.CHUNK)
+        chunk = list(self.chunks[c])
+        chunk[offset] = word
+        chunks = list(self.chunks)
+        chunks[c] = tuple(chunk)
+        used = dict(self.used)
+        used[length] = used.get(length, 0) | (1 << word)
+        return SearchState(tuple(chunks), used, self.assigned + 1, self.hash_value ^ hash((var_id, word)))
+
+    def __hash__(self):
+        return self.hash_value
+
+    def __eq__(self, other):
+        return self.hash_value == other.hash_value and self.chunks == other.chunks
+
 
 class PriorityQueue():
+    """
+    Frontier that pops the highest priority first, every queued item has a hashable key
+    (the canonical form of its state) and `entries` maps the key to its heap entry so that
+    membership is O(1) and a key pushed again with a better priority replaces the queued one
+    (decrease-key on the heap, the replaced entry is marked removed and skipped when popped).
+    """
+
+    REMOVED = object()
+
     def __init__(self):
         self.frontier = []
+        self.entries = dict()
+        self.counter = itertools.count()   # ties are broken by insertion order, items are never compared
 
-    def push(self, priority, x):
-        heapq.heappush(self.frontier, (-priority, x))
+    def push(self, priority, x, key):
+        """
+        Queue `x` under `key`, return False if `key` is already queued with the same or a better priority.
+        """
+        entry = self.entries.get(key)
+        if entry is not None:
+            if -priority >= entry[0]:
+                return False
+            entry[-1] = PriorityQueue.REMOVED
+        entry = [-priority, next(self.counter), key, x]
+        self.entries[key] = entry
+        heapq.heappush(self.frontier, entry)
+        return True
 
     def pop(self):
-        _, x = heapq.heappop(self.frontier)
-        return x
+        while self.frontier:
+            _, _, key, x = heapq.heappop(self.frontier)
+            if x is not PriorityQueue.REMOVED:
+                del self.entries[key]
+                return x
+        raise KeyError("pop from an empty priority queue")
 
     def empty(self):
-        return len(self.frontier) == 0
-
-    def contains_state(self,state):
-        return any(node[1].state == state for node in self.frontier)
+        return len(self.entries) == 0
 
+    def __len__(self):
+        return len(self.entries)
 
-    def __print__(self):
-        pass
+    def contains(self, key):
+        return key in self.entries